@@ -1,11 +1,31 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, g
+import atexit
+import hmac
+import sys
+from flask import Flask, render_template, request, redirect, url_for, session, send_file, g, jsonify, abort, stream_with_context
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-from models import db, User, Project, ProjectMember, Task, Note, Message
-from datetime import datetime
-from werkzeug.utils import secure_filename
-from sqlalchemy.orm import joinedload 
+from flask_socketio import SocketIO, join_room, rooms
+from models import db, User, Project, ProjectMember, Task, Note, Message, Blob, UploadSession
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_, select, literal, true, update, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import joinedload, aliased
+from chat_writer import MessageWriter
+from dashboard_cache import DashboardCache
+from db_profile import configure_database, install_sqlite_pragmas
+from socket_backends import socketio_options
+from identity_cache import IdentityCache
+from migrations import run_migrations
+import search
+from storage import BlobStore, ChunkedUploads, file_digest
+from note_processing import NoteProcessor
+from metrics import Metrics
+from message_archive import archived_page
+import project_export
+from werkzeug.security import safe_join
 
 # Ensure instance folder exists
 instance_path = os.path.join(os.path.dirname(__file__), 'instance')
@@ -18,31 +38,247 @@ template_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'templat
 app = Flask(__name__, template_folder=template_dir)
 
 app.secret_key = "supersecretkey"
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+# SQLite (WAL) by default; DATABASE_URL selects e.g. a pooled PostgreSQL engine instead
+configure_database(app, f"sqlite:///{db_path}")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["UPLOAD_FOLDER"] = os.path.join("static", "uploads")
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
+# Uploaded notes are stored once per content hash under BLOB_FOLDER
+app.config["BLOB_FOLDER"] = os.path.join(app.root_path, app.config["UPLOAD_FOLDER"], "blobs")
+app.config["UPLOAD_MAX_BYTES"] = int(os.environ.get("UPLOAD_MAX_BYTES", 100 * 1024 * 1024))
+# Leave room for the multipart envelope around a file of UPLOAD_MAX_BYTES
+app.config["MAX_CONTENT_LENGTH"] = app.config["UPLOAD_MAX_BYTES"] + 64 * 1024
+# Resumable uploads: large files are sent as fixed-size chunks and assembled on finalize
+app.config["CHUNKED_UPLOAD_FOLDER"] = os.path.join(app.config["BLOB_FOLDER"], "chunks")
+app.config["CHUNKED_UPLOAD_MAX_BYTES"] = int(os.environ.get("CHUNKED_UPLOAD_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+app.config["UPLOAD_CHUNK_BYTES"] = 8 * 1024 * 1024
+app.config["UPLOAD_SESSION_TTL_HOURS"] = 24
+# A finalize claim older than this is taken to belong to a request that died mid-assembly
+app.config["UPLOAD_FINALIZE_STALE_SECONDS"] = 600
+# Content-addressed files never change, so browsers may keep them for a year
+app.config["UPLOAD_IMMUTABLE_MAX_AGE"] = 365 * 24 * 3600
+# Optional proxy offload for /uploads: "" (Python streams the file), "x-sendfile"
+# (Apache/lighttpd) or "x-accel" (nginx, with UPLOAD_ACCEL_PREFIX mapped to UPLOAD_FOLDER
+# as an internal location)
+app.config["UPLOAD_OFFLOAD"] = os.environ.get("UPLOAD_OFFLOAD", "")
+app.config["UPLOAD_ACCEL_PREFIX"] = os.environ.get("UPLOAD_ACCEL_PREFIX", "/_protected_uploads/")
+app.config["USE_X_SENDFILE"] = app.config["UPLOAD_OFFLOAD"] in ("x-sendfile", "x-accel")
+
+# Chat group commit: flush pending messages every N ms or after N messages.
+# CHAT_DELIVERY_MODE is "durable" (emit after commit) or "fast" (emit first, persist with the next batch).
+app.config["CHAT_FLUSH_INTERVAL_MS"] = int(os.environ.get("CHAT_FLUSH_INTERVAL_MS", 5))
+app.config["CHAT_FLUSH_MAX_BATCH"] = int(os.environ.get("CHAT_FLUSH_MAX_BATCH", 100))
+app.config["CHAT_DELIVERY_MODE"] = os.environ.get("CHAT_DELIVERY_MODE", "durable")
+app.config["CHAT_PAGE_SIZE"] = 50
+app.config["CHAT_MAX_PAGE_SIZE"] = 200
+app.config["SEARCH_PAGE_SIZE"] = 20
+app.config["SEARCH_MAX_PAGE_SIZE"] = 50
+app.config["INVITE_CANDIDATE_LIMIT"] = 10
+# Web project imports: the most bytes an uploaded export may decompress to
+app.config["IMPORT_MAX_BYTES"] = int(os.environ.get("IMPORT_MAX_BYTES", 256 * 1024 * 1024))
+# Background note processing (page count, thumbnail, PDF text); 0 workers disables it
+app.config["NOTE_WORKERS"] = int(os.environ.get("NOTE_WORKERS", 2))
+app.config["NOTE_POLL_INTERVAL"] = 30
+app.config["NOTE_JOB_STALE_AFTER"] = 600
+# A single extraction running longer than this is failed and its worker process killed
+app.config["NOTE_JOB_TIMEOUT"] = 120
+# Instrumentation served at /metrics; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+app.config["METRICS_SLOW_QUERY_MS"] = int(os.environ.get("METRICS_SLOW_QUERY_MS", 200))
+app.config["METRICS_N_PLUS_ONE_THRESHOLD"] = int(os.environ.get("METRICS_N_PLUS_ONE_THRESHOLD", 10))
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+app.config["DASHBOARD_CACHE_TTL"] = int(os.environ.get("DASHBOARD_CACHE_TTL", 30))
+app.config["IDENTITY_CACHE_TTL"] = int(os.environ.get("IDENTITY_CACHE_TTL", 300))
+
 db.init_app(app)
+metrics = Metrics(slow_query_ms=app.config["METRICS_SLOW_QUERY_MS"],
+                  n_plus_one_threshold=app.config["METRICS_N_PLUS_ONE_THRESHOLD"],
+                  logger=app.logger)
+with app.app_context():
+    install_sqlite_pragmas(app, db.engine)
+    # Installed before the other request hooks, so their SQL counts towards the request
+    metrics.install(app, db.engine)
 CORS(app)
-socketio = SocketIO(app)
+# SOCKETIO_MESSAGE_QUEUE lets several worker processes share emits (see socket_backends.py)
+socketio = SocketIO(app, **socketio_options(app))
+
+identity_cache = IdentityCache(ttl=app.config["IDENTITY_CACHE_TTL"])
+identity_cache.track_changes()
+
+# Static files and uploads never need the logged-in user
+NO_USER_ENDPOINTS = {"static", "uploaded_file", "uploaded_blob", "metrics_view"}
 
 # --- Load user before every request to populate g.user for base.html ---
 @app.before_request
 def load_logged_in_user():
-    """Loads the logged-in user from the database and sets it on the Flask 'g' object."""
+    """Sets the logged-in user's Identity (id, username) on the Flask 'g' object, from the identity cache."""
     user_id = session.get("user_id")
-    if user_id is None:
+    if user_id is None or request.endpoint in NO_USER_ENDPOINTS:
         g.user = None
     else:
-        # Load user object from the database for use in templates (e.g., base.html)
-        g.user = User.query.get(user_id)
+        # Shared with route handlers, which use g.user instead of querying User again
+        g.user = identity_cache.get(user_id)
 # ----------------------------------------------------------------------------
 
 
+def project_room(project_id):
+    """Socket.IO room name for a project; chat and task events are only sent here."""
+    return f"project_{project_id}"
+
+
+COLOR_CLASSES = ["text-primary", "text-success", "text-danger", "text-warning", "text-info"]
+
+
+def color_class_for(user_id):
+    """Chat color class for a user, stable across page loads and live messages."""
+    return COLOR_CLASSES[user_id % len(COLOR_CLASSES)]
+
+
+def chat_sender(user_id):
+    """(username, color_class) for a chat sender from the identity cache, so each message doesn't query User.
+    Raises LookupError for unknown users."""
+    user = identity_cache.get(user_id)
+    if user is None:
+        raise LookupError(user_id)
+    return user.username, color_class_for(user.id)
+
+
+message_writer = MessageWriter(
+    app, socketio, project_room,
+    flush_interval_ms=app.config["CHAT_FLUSH_INTERVAL_MS"],
+    max_batch=app.config["CHAT_FLUSH_MAX_BATCH"],
+    delivery=app.config["CHAT_DELIVERY_MODE"],
+)
+# Messages still queued when the process exits are written, not dropped
+atexit.register(message_writer.close)
+
+dashboard_cache = DashboardCache(ttl=app.config["DASHBOARD_CACHE_TTL"])
+dashboard_cache.track_changes()
+
+blob_store = BlobStore(app.config["BLOB_FOLDER"])
+chunked_uploads = ChunkedUploads(app.config["CHUNKED_UPLOAD_FOLDER"])
+note_processor = NoteProcessor(
+    app, socketio, blob_store,
+    workers=app.config["NOTE_WORKERS"],
+    poll_interval=app.config["NOTE_POLL_INTERVAL"],
+    stale_after=app.config["NOTE_JOB_STALE_AFTER"],
+    job_timeout=app.config["NOTE_JOB_TIMEOUT"],
+)
+
+
+def message_page(project_id, before_ts=None, before_id=None, limit=None, include_archived=False):
+    """One page of a project's chat history, newest first.
+
+    Keyset pagination on (timestamp, id): each page starts strictly before the
+    last message of the previous one, so the cost stays flat however deep the
+    history goes (served by ix_message_project_timestamp_id).
+
+    With include_archived, a page that runs out of rows in `message` carries
+    on into the archive (message_archive.py), whose messages are all older;
+    those come back as ArchivedMessage tuples with the same fields.
+    Senders' usernames come from the identity cache (username_of).
+    """
+    limit = limit or app.config["CHAT_PAGE_SIZE"]
+    query = Message.query.filter(Message.project_id == project_id)
+    if before_ts is not None and before_id is not None:
+        query = query.filter(tuple_(Message.timestamp, Message.id) < tuple_(before_ts, before_id))
+    messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit).all()
+    if include_archived and len(messages) < limit:
+        if messages:
+            before_ts, before_id = messages[-1].timestamp, messages[-1].id
+        messages += archived_page(db.session, project_id, before_ts, before_id, limit - len(messages))
+    return messages
+
+
+def next_message_cursor(messages, limit):
+    """Cursor for the page after `messages`, or None when history is exhausted."""
+    if len(messages) < limit:
+        return None
+    last = messages[-1]
+    return {"before_ts": last.timestamp.isoformat(), "before_id": last.id}
+
+
+def dialect_insert(table):
+    """INSERT for `table` that supports on_conflict_do_nothing() on both SQLite and PostgreSQL."""
+    dialect = postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def add_project_members(project_id, user_ids):
+    """Add users to a project in a single INSERT and return the ids actually added.
+
+    `user_ids` is either a list of ids or a SELECT of user ids (sent as
+    INSERT ... SELECT). The unique (project_id, user_id) index skips existing
+    members via ON CONFLICT DO NOTHING, so there is no per-user read before the
+    write. Caller commits.
+    """
+    members = ProjectMember.__table__
+    if isinstance(user_ids, (list, tuple, set)):
+        if not user_ids:
+            return []
+        user_ids = select(User.id).where(User.id.in_(list(user_ids)))
+    # The WHERE keeps SQLite from parsing ON CONFLICT as a join constraint
+    source = select(literal(project_id), user_ids.subquery().c[0]).where(true())
+    stmt = dialect_insert(members).from_select(["project_id", "user_id"], source)
+    stmt = stmt.on_conflict_do_nothing(index_elements=["project_id", "user_id"]).returning(members.c.user_id)
+    added = db.session.execute(stmt).scalars().all()
+    # Bulk statements bypass the flush hook, so tell the dashboard cache directly
+    dashboard_cache.record(db.session, project_ids=[project_id], user_ids=added)
+    return added
+
+
+def original_filename(filename):
+    # Keep the original name for display and downloads; it is never used as a path
+    return os.path.basename(filename.replace("\\", "/"))[:200]
+
+
+def add_note(project_id, filename, digest, size):
+    """Add a Note for a blob already in the blob store, recording the blob once. Caller commits."""
+    db.session.execute(
+        dialect_insert(Blob.__table__).values(sha256=digest, size=size, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["sha256"])
+    )
+    note = Note(user_id=session["user_id"], project_id=project_id, filename=filename or digest, blob_sha256=digest)
+    db.session.add(note)
+    return note
+
+
+def save_note(file, project_id):
+    """Stream an uploaded file into the blob store and add a Note for it. Caller commits."""
+    digest, size = blob_store.save_stream(file.stream, max_size=app.config["UPLOAD_MAX_BYTES"])
+    return add_note(project_id, original_filename(file.filename), digest, size)
+
+
+def can_add_notes(project, user_id):
+    """Personal projects take notes from their owner, team projects from any member."""
+    if project is None:
+        return False
+    if project.is_team:
+        return ProjectMember.query.filter_by(project_id=project.id, user_id=user_id).first() is not None
+    return project.owner_id == user_id
+
+
+@app.template_global()
+def note_url(note):
+    if note.blob_sha256:
+        return url_for("uploaded_blob", digest=note.blob_sha256, filename=note.filename)
+    return url_for("uploaded_file", filename=note.filename)
+
+
+@app.template_global()
+def note_thumbnail_url(note):
+    """URL of the note's first-page thumbnail, or None until processing has made one."""
+    if note.blob is None or note.blob.thumbnail_sha256 is None:
+        return None
+    name = os.path.splitext(note.filename)[0] + ".png"
+    return url_for("uploaded_blob", digest=note.blob.thumbnail_sha256, filename=name)
+
+
 def create_tables():
     with app.app_context():
         db.create_all()
+        # create_all() never alters existing tables; indexes and columns added later are migrations
+        run_migrations(db.engine)
 
 @app.route("/register", methods=["GET", "POST"])
 def register():
@@ -93,76 +329,103 @@ def toggle_dark_mode():
 
 @app.route("/dashboard")
 def dashboard():
-    if "user_id" not in session:
+    if "user_id" not in session or g.user is None:
         return redirect(url_for("login"))
-    user = User.query.get(session["user_id"])
-    user_projects = ProjectMember.query.filter_by(user_id=user.id).all()
-    projects = [Project.query.get(p.project_id) for p in user_projects]
-    total_users = User.query.count()
-
-    personal_projects = []
-    team_projects = []
-    all_project_ids = [p.id for p in projects]
-    
-    # New: Fetch user's tasks and pending tasks
-    # Fetch all tasks from projects the user is a member of (Team & Personal)
-    all_tasks = Task.query.filter(Task.project_id.in_(all_project_ids)).order_by(Task.due_date).all()
-    
-    # Filter for pending tasks assigned to the user
-    # FIX: Use joinedload to eagerly fetch the Project, Assignee, and Submitter User objects
-    pending_tasks = Task.query.options(
-        joinedload(Task.project), 
-        joinedload(Task.assignee),
-        joinedload(Task.submitter_user)
-    ).filter(
-        Task.project_id.in_(all_project_ids),
+    user = g.user
+    data = dashboard_cache.get(user.id)
+    if data is None:
+        built_at = dashboard_cache.start()
+        data = build_dashboard_data(user.id)
+        dashboard_cache.set(user.id, built_at, data["project_ids"], data)
+
+    return render_template("dashboard.html", user=user,
+                           personal_projects=data["personal_projects"],
+                           team_projects=data["team_projects"],
+                           messages=data["messages"],
+                           joinable_projects=data["joinable_projects"],
+                           pending_tasks=data["pending_tasks"]) # Passed pending tasks
+
+DASHBOARD_MESSAGE_COUNT = 20
+
+def build_dashboard_data(user_id):
+    """Dashboard data for a user in four set-based queries, as plain dicts so it can be cached."""
+    member_project_ids = db.session.query(ProjectMember.project_id).filter(ProjectMember.user_id == user_id)
+
+    # 1. Every project the user is a member of
+    projects = Project.query.filter(Project.id.in_(member_project_ids.scalar_subquery())).all()
+    project_ids = [p.id for p in projects]
+    team_projects = [p for p in projects if p.is_team] # Use is_team flag instead of member count comparison
+    personal_projects = [p for p in projects if not p.is_team and p.owner_id == user_id]
+
+    # 2. Pending tasks assigned to the user, with their project eagerly loaded
+    pending_tasks = Task.query.options(joinedload(Task.project)).filter(
+        Task.project_id.in_(project_ids),
         Task.submitted == False,
-        Task.assigned_to == user.id # assuming tasks created in a team project are assigned to the creator by default
+        Task.assigned_to == user_id # assuming tasks created in a team project are assigned to the creator by default
     ).order_by(Task.due_date).all()
 
-    for p in projects:
-        member_count = ProjectMember.query.filter_by(project_id=p.id).count()
-        if p.is_team: # Use is_team flag instead of member count comparison
-            team_projects.append(p)
-        elif p.owner_id == user.id:
-            personal_projects.append(p)
+    # 3. Latest messages across the user's team projects: each project's newest 20 come off
+    # ix_message_project_timestamp_id (a correlated LIMIT per project), so only those are sorted,
+    # never every message of every project
+    recent = aliased(Message)
+    recent_ids = select(recent.id).where(recent.project_id == Project.id).order_by(
+        recent.timestamp.desc(), recent.id.desc()
+    ).limit(DASHBOARD_MESSAGE_COUNT).correlate(Project)
+    messages = Message.query.options(joinedload(Message.sender)).join(
+        Project, Message.id.in_(recent_ids)
+    ).filter(
+        Project.id.in_([p.id for p in team_projects])
+    ).order_by(Message.timestamp.desc(), Message.id.desc()).limit(DASHBOARD_MESSAGE_COUNT).all()
 
-    team_project_ids = [p.id for p in team_projects]
-    messages = Message.query.filter(Message.project_id.in_(team_project_ids)).order_by(Message.timestamp.desc()).limit(20).all()
-    joined_ids = [p.project_id for p in user_projects]
-    joinable_projects = Project.query.filter(~Project.id.in_(joined_ids)).all()
+    # 4. Projects the user has not joined yet
+    joinable_projects = Project.query.options(joinedload(Project.owner)).filter(
+        ~Project.id.in_(member_project_ids.scalar_subquery())
+    ).all()
 
-    return render_template("dashboard.html", user=user,
-                           personal_projects=personal_projects,
-                           team_projects=team_projects,
-                           messages=messages,
-                           joinable_projects=joinable_projects,
-                           pending_tasks=pending_tasks) # Passed pending tasks
+    return {
+        "project_ids": project_ids,
+        "personal_projects": [{"id": p.id, "name": p.name} for p in personal_projects],
+        "team_projects": [{"id": p.id, "name": p.name} for p in team_projects],
+        "pending_tasks": [{
+            "id": t.id,
+            "title": t.title,
+            "due_date": t.due_date,
+            "project": {"id": t.project.id, "name": t.project.name}
+        } for t in pending_tasks],
+        "messages": [{
+            "text": m.text,
+            "timestamp": m.timestamp,
+            "sender": {"username": m.sender.username}
+        } for m in messages],
+        "joinable_projects": [{
+            "id": p.id,
+            "name": p.name,
+            "owner": {"username": p.owner.username}
+        } for p in joinable_projects],
+    }
 
 @app.route("/projects/<int:project_id>/join", methods=["POST"])
 def join_project(project_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
-    existing = ProjectMember.query.filter_by(project_id=project_id, user_id=session["user_id"]).first()
-    if not existing:
-        db.session.add(ProjectMember(project_id=project_id, user_id=session["user_id"]))
-        db.session.commit()
+    add_project_members(project_id, [session["user_id"]])
+    db.session.commit()
     return redirect(url_for("dashboard"))
 
 @app.route("/profile")
 def profile():
-    if "user_id" not in session:
+    if "user_id" not in session or g.user is None:
         return redirect(url_for("login"))
-    user = User.query.get(session["user_id"])
+    user = g.user
     memberships = ProjectMember.query.filter_by(user_id=user.id).all()
-    projects = [Project.query.get(m.project_id) for m in memberships]
+    projects = [db.session.get(Project, m.project_id) for m in memberships]
     return render_template("profile.html", user=user, projects=projects)
 
 @app.route("/projects/<int:project_id>")
 def view_project(project_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
-    project = Project.query.get(project_id)
+    project = db.session.get(Project, project_id)
     if not project or project.is_team:
         return "Access denied", 403
     if project.owner_id != session["user_id"]:
@@ -174,18 +437,15 @@ def view_project(project_id):
 def upload_personal_note(project_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
-    project = Project.query.get(project_id)
+    project = db.session.get(Project, project_id)
     if not project or project.is_team or project.owner_id != session["user_id"]:
         return "Access denied", 403
     # Note: File input name must be 'file' to match templates/project.html fix
     file = request.files.get("file")
-    if file:
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
-        note = Note(user_id=session["user_id"], project_id=project_id, filename=filename)
-        db.session.add(note)
+    if file and file.filename:
+        save_note(file, project_id)
         db.session.commit()
+        note_processor.wake()
     return redirect(url_for("view_project", project_id=project_id))
 
 @app.route("/team-projects", methods=["GET", "POST"])
@@ -197,15 +457,10 @@ def team_projects():
         if name:
             project = Project(name=name, owner_id=session["user_id"], is_team=True)
             db.session.add(project)
-            db.session.commit()
+            db.session.flush()
             
-            # Add all users as members (per original logic structure)
-            all_users = User.query.all()
-            for user in all_users:
-                existing = ProjectMember.query.filter_by(project_id=project.id, user_id=user.id).first()
-                if not existing:
-                    member = ProjectMember(project_id=project.id, user_id=user.id)
-                    db.session.add(member)
+            # Add all users as members (per original logic structure) in one INSERT ... SELECT
+            add_project_members(project.id, select(User.id))
             db.session.commit()
             return redirect(url_for("view_team_project", project_id=project.id)) # Redirect to new detail view
             
@@ -220,7 +475,7 @@ def view_team_project(project_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
     user_id = session["user_id"]
-    project = Project.query.get(project_id)
+    project = db.session.get(Project, project_id)
     
     # Check if the project is a team project and if the user is a member
     is_member = ProjectMember.query.filter_by(project_id=project_id, user_id=user_id).first()
@@ -230,65 +485,424 @@ def view_team_project(project_id):
 
     # Fetch all necessary data for the detailed view
     tasks = Task.query.filter_by(project_id=project_id).options(joinedload(Task.submitter_user), joinedload(Task.assignee)).all()
-    notes = Note.query.filter_by(project_id=project_id).all()
+    # Derived data (size, pages, thumbnail) comes from the blob; its extracted text stays deferred
+    notes = Note.query.filter_by(project_id=project_id).options(joinedload(Note.blob)).all()
     
     # Fetch members, eagerly loading User details
     memberships = ProjectMember.query.filter_by(project_id=project_id).options(joinedload(ProjectMember.user)).all()
     members = [m.user for m in memberships]
     
-    # Fetch recent chat messages and available users for invite
-    messages = Message.query.filter_by(project_id=project_id).options(joinedload(Message.sender)).order_by(Message.timestamp.desc()).limit(50).all()
+    # Fetch the first page of chat history (older pages, archived ones included, load on scroll)
+    messages = message_page(project_id, include_archived=True)
     
-    # Assign color classes to each user for chat display (replicated logic)
-    color_classes = ["text-primary", "text-success", "text-danger", "text-warning", "text-info"]
+    # Assign color classes to each user for chat display
     user_colors = {}
     for msg in messages:
         uid = msg.sender_id
         if uid not in user_colors:
-            user_colors[uid] = color_classes[uid % len(color_classes)]
-    
-    all_users = User.query.all()
-    member_ids = {m.user_id for m in memberships}
-    joinable_users = [u for u in all_users if u.id not in member_ids]
+            user_colors[uid] = color_class_for(uid)
     
+    # Invite candidates are not listed here; the invite box fetches them as the user types (invite_candidates)
     return render_template("view_team_project.html", 
                            project=project, 
                            tasks=tasks, 
                            notes=notes, 
                            members=members, 
                            messages=messages,
-                           user_colors=user_colors,
-                           all_users=joinable_users)
+                           next_cursor=next_message_cursor(messages, app.config["CHAT_PAGE_SIZE"]),
+                           user_colors=user_colors)
+
+
+@app.route("/team-projects/<int:project_id>/messages")
+def project_messages(project_id):
+    """JSON chat history, paged with ?before_ts=<iso>&before_id=<id>&limit=<n>;
+    &include_archived=1 carries on into archived messages once the recent ones run out."""
+    if "user_id" not in session:
+        return jsonify(error="Login required"), 401
+    is_member = ProjectMember.query.filter_by(project_id=project_id, user_id=session["user_id"]).first()
+    if not is_member:
+        return jsonify(error="Access denied"), 403
+
+    before_ts = request.args.get("before_ts")
+    before_id = request.args.get("before_id", type=int)
+    limit = request.args.get("limit", app.config["CHAT_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, app.config["CHAT_MAX_PAGE_SIZE"]))
+    try:
+        before_ts = datetime.fromisoformat(before_ts) if before_ts else None
+    except ValueError:
+        return jsonify(error="Invalid before_ts"), 400
+    # A cursor is both halves of the last message's (timestamp, id), never one of them
+    if (before_ts is None) != (before_id is None):
+        return jsonify(error="before_ts and before_id must be given together"), 400
+
+    include_archived = request.args.get("include_archived", "0") not in ("", "0", "false")
+    messages = message_page(project_id, before_ts, before_id, limit, include_archived)
+    return jsonify(messages=[{
+        "id": msg.id,
+        "sender_id": msg.sender_id,
+        "project_id": msg.project_id,
+        "username": username_of(msg.sender_id),
+        "color_class": color_class_for(msg.sender_id),
+        "text": msg.text,
+        "timestamp": msg.timestamp.strftime('%H:%M')
+    } for msg in messages], next=next_message_cursor(messages, limit))
+
+
+@app.route("/projects/<int:project_id>/export")
+def export_project(project_id):
+    """Download a project as NDJSON (project_export.py), gzip-compressed unless ?gzip=0.
+    Streamed as it is read, so a project with a long history never has to fit in memory."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    project = db.session.get(Project, project_id)
+    if not project or project.owner_id != session["user_id"]:
+        return "Access denied", 403
+    compress = request.args.get("gzip", "1") not in ("", "0", "false")
+    filename = f"project-{project_id}.ndjson" + (".gz" if compress else "")
+    chunks = project_export.ndjson(project_export.export_records(db.session, project_id), compress)
+    return app.response_class(stream_with_context(chunks), headers={
+        "Content-Type": "application/gzip" if compress else "application/x-ndjson",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    })
+
+
+@app.route("/projects/import", methods=["POST"])
+def import_project():
+    """Create a new project owned by the current user from an uploaded export (gzip or plain NDJSON),
+    with all of its members, tasks, notes and messages attributed to that user."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    file = request.files.get("file")
+    if not file or not file.filename:
+        return "No file uploaded", 400
+    try:
+        # Everything is attributed to the uploader, who can't speak for the other users an export names
+        lines = project_export.open_export(file.stream, max_bytes=app.config["IMPORT_MAX_BYTES"])
+        project, counts = project_export.import_project(db.session, lines, session["user_id"],
+                                                        attribute_to_owner=True)
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError, OSError, EOFError, zlib.error,
+            IntegrityError, DataError) as exc:
+        db.session.rollback()
+        return f"Invalid project export: {exc}", 400
+    if wants_json():
+        return jsonify(project_id=project.id, **counts)
+    if project.is_team:
+        return redirect(url_for("view_team_project", project_id=project.id))
+    return redirect(url_for("view_project", project_id=project.id))
+
+
+@app.route("/metrics")
+def metrics_view():
+    """Prometheus text exposition of request, SQL and socket handler metrics for this process."""
+    token = app.config["METRICS_TOKEN"]
+    if token:
+        # 401 without credentials, 403 with the wrong ones
+        supplied = request.headers.get("Authorization")
+        if not supplied:
+            return "Bearer token required", 401, {"WWW-Authenticate": "Bearer"}
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            abort(403)
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@app.route("/search")
+def search_view():
+    """Ranked JSON search over messages, tasks and notes in the user's projects.
+    ?q=<text>&project_id=<optional>&page=<1-based>&per_page=<n>"""
+    if "user_id" not in session:
+        return jsonify(error="Login required"), 401
+    query = request.args.get("q", "").strip()
+    project_id = request.args.get("project_id", type=int)
+    page = max(1, request.args.get("page", 1, type=int))
+    per_page = request.args.get("per_page", app.config["SEARCH_PAGE_SIZE"], type=int)
+    per_page = max(1, min(per_page, app.config["SEARCH_MAX_PAGE_SIZE"]))
+    if not query:
+        return jsonify(results=[], page=page, has_more=False)
+
+    # One extra row tells us whether there is a next page
+    hits = search.search(db.session, session["user_id"], query, project_id,
+                         limit=per_page + 1, offset=(page - 1) * per_page)
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+
+    projects = {p.id: p for p in Project.query.filter(Project.id.in_({h["project_id"] for h in hits}))}
+    note_ids = [h["ref_id"] for h in hits if h["kind"] == "note"]
+    notes = {n.id: n for n in Note.query.filter(Note.id.in_(note_ids))} if note_ids else {}
+
+    results = []
+    for hit in hits:
+        project = projects.get(hit["project_id"])
+        if project is None:
+            continue
+        if hit["kind"] == "note" and hit["ref_id"] in notes:
+            url = note_url(notes[hit["ref_id"]])
+        elif project.is_team:
+            url = url_for("view_team_project", project_id=project.id,
+                          _anchor="chat" if hit["kind"] == "message" else "tasks")
+        else:
+            url = url_for("view_project", project_id=project.id)
+        results.append({**hit, "project_name": project.name, "url": url})
+    return jsonify(results=results, page=page, has_more=has_more)
 
 
 @app.route("/team-projects/<int:project_id>/upload", methods=["POST"])
 def upload_team_note(project_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
-    project = Project.query.get(project_id)
+    project = db.session.get(Project, project_id)
     is_member = ProjectMember.query.filter_by(project_id=project_id, user_id=session["user_id"]).first()
     if not project or not project.is_team or not is_member:
         return "Access denied", 403
     file = request.files.get("file")
-    if file:
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
-        note = Note(user_id=session["user_id"], project_id=project_id, filename=filename)
-        db.session.add(note)
+    if file and file.filename:
+        save_note(file, project_id)
         db.session.commit()
+        note_processor.wake()
     return redirect(url_for("view_team_project", project_id=project_id, _anchor='files')) # Redirect to detailed view
 
+def serve_upload(path, etag, download_name, immutable):
+    """Send an uploaded file with a strong ETag (304 when it matches) and Range support.
+
+    With UPLOAD_OFFLOAD set, only headers are produced and the proxy sends the
+    body (and handles Range itself), so workers never stream file bytes.
+    """
+    max_age = app.config["UPLOAD_IMMUTABLE_MAX_AGE"] if immutable else None
+    offload = app.config["UPLOAD_OFFLOAD"]
+    response = send_file(path, download_name=download_name, etag=etag, max_age=max_age, conditional=not offload)
+    if offload:
+        response = response.make_conditional(request, accept_ranges=False)
+        sendfile_path = response.headers.pop("X-Sendfile", None)
+        if sendfile_path and response.status_code == 200 and offload == "x-accel":
+            upload_root = os.path.join(app.root_path, app.config["UPLOAD_FOLDER"])
+            internal = os.path.relpath(sendfile_path, upload_root).replace(os.sep, "/")
+            response.headers["X-Accel-Redirect"] = app.config["UPLOAD_ACCEL_PREFIX"] + internal
+        elif sendfile_path and response.status_code == 200:
+            response.headers["X-Sendfile"] = sendfile_path
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        # The name may be reused for different content: always revalidate (cheap with the ETag)
+        response.cache_control.no_cache = True
+    return response
+
 @app.route("/uploads/<filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    # Notes uploaded before content-addressed storage
+    path = safe_join(os.path.join(app.root_path, app.config["UPLOAD_FOLDER"]), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return serve_upload(path, file_digest(path), filename, immutable=False)
+
+@app.route("/uploads/<digest>/<path:filename>")
+def uploaded_blob(digest, filename):
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest) or not blob_store.exists(digest):
+        abort(404)
+    # The digest is the content hash, so it is a strong ETag and the URL never changes meaning
+    return serve_upload(blob_store.path(digest), digest, filename, immutable=True)
+
+# --- Resumable chunked uploads: init, upload chunk N (any order, retryable), finalize ---
+def get_upload_session(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.user_id != session.get("user_id"):
+        return None
+    return upload
+
+def upload_status(upload):
+    received = chunked_uploads.received(upload.id)
+    return {
+        "upload_id": upload.id,
+        "chunk_size": upload.chunk_size,
+        "chunk_count": upload.chunk_count,
+        "missing": [i for i in range(upload.chunk_count) if i not in received],
+        "note_id": upload.note_id,
+        "finalizing": upload.note_id is None and upload.finalizing_at is not None,
+    }
+
+def claim_upload_finalize(upload_id):
+    """Atomically make this request the one that assembles an upload; False if it is already
+    finalized or another request holds a claim that is not yet stale. Commits."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=app.config["UPLOAD_FINALIZE_STALE_SECONDS"])
+    # The WHERE makes check-and-set one statement, so concurrent finalizes can't both win
+    result = db.session.execute(
+        update(UploadSession).where(
+            UploadSession.id == upload_id, UploadSession.note_id.is_(None),
+            or_(UploadSession.finalizing_at.is_(None), UploadSession.finalizing_at < stale),
+        ).values(finalizing_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+@app.route("/projects/<int:project_id>/uploads", methods=["POST"])
+def init_chunked_upload(project_id):
+    if "user_id" not in session:
+        return jsonify(error="Login required"), 401
+    if not can_add_notes(db.session.get(Project, project_id), session["user_id"]):
+        return jsonify(error="Access denied"), 403
+    data = request.get_json(silent=True) or {}
+    filename = original_filename(str(data.get("filename", "")))
+    size = data.get("size")
+    if not filename or not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        return jsonify(error="filename and size are required"), 400
+    if size > app.config["CHUNKED_UPLOAD_MAX_BYTES"]:
+        return jsonify(error=f"Uploads are limited to {app.config['CHUNKED_UPLOAD_MAX_BYTES']} bytes"), 413
+
+    # Drop abandoned uploads before starting a new one
+    cutoff = datetime.utcnow() - timedelta(hours=app.config["UPLOAD_SESSION_TTL_HOURS"])
+    for stale in UploadSession.query.filter(UploadSession.created_at < cutoff).all():
+        chunked_uploads.discard(stale.id)
+        db.session.delete(stale)
+
+    upload = UploadSession(id=uuid.uuid4().hex, user_id=session["user_id"], project_id=project_id,
+                           filename=filename, total_size=size, chunk_size=app.config["UPLOAD_CHUNK_BYTES"])
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify(upload_status(upload)), 201
+
+@app.route("/uploads/sessions/<upload_id>", methods=["GET"])
+def chunked_upload_status(upload_id):
+    upload = get_upload_session(upload_id)
+    if upload is None:
+        return jsonify(error="Upload not found"), 404
+    return jsonify(upload_status(upload))
+
+@app.route("/uploads/sessions/<upload_id>/chunks/<int:index>", methods=["PUT"])
+def upload_chunk(upload_id, index):
+    upload = get_upload_session(upload_id)
+    if upload is None:
+        return jsonify(error="Upload not found"), 404
+    if upload.note_id is not None:
+        return jsonify(error="Upload already finalized"), 409
+    if upload.finalizing_at is not None:
+        return jsonify(error="Upload is being finalized"), 409
+    if index >= upload.chunk_count:
+        return jsonify(error="Chunk index out of range"), 400
+    expected = upload.chunk_length(index)
+    if not chunked_uploads.write_chunk(upload.id, index, request.stream, expected):
+        return jsonify(error=f"Chunk {index} must be exactly {expected} bytes"), 400
+    return jsonify(received=index)
+
+@app.route("/uploads/sessions/<upload_id>/finalize", methods=["POST"])
+def finalize_chunked_upload(upload_id):
+    """Assemble the chunks into a note. Safe to retry, also concurrently: one request claims the
+    upload and assembles it, the others get 202 (ask again) meanwhile and the same note after."""
+    upload = get_upload_session(upload_id)
+    if upload is None:
+        return jsonify(error="Upload not found"), 404
+    if upload.note_id is None:
+        status = upload_status(upload)
+        if status["missing"]:
+            return jsonify(status), 409
+        if not claim_upload_finalize(upload.id):
+            # Another request is assembling it, or finished since we looked
+            if upload.note_id is None:
+                return jsonify(upload_status(upload)), 202
+        else:
+            try:
+                assembled = chunked_uploads.open_assembled(upload.id, upload.chunk_count)
+                try:
+                    digest, size = blob_store.save_stream(assembled)
+                finally:
+                    assembled.close()
+                note = add_note(upload.project_id, upload.filename, digest, size)
+                db.session.flush()
+                upload.note_id = note.id
+                db.session.commit()
+            except BaseException:
+                # Release the claim so a retry can assemble it
+                db.session.rollback()
+                db.session.execute(update(UploadSession).where(UploadSession.id == upload_id).values(finalizing_at=None))
+                db.session.commit()
+                raise
+            # Only the claiming request reads the chunks, so they can go once the note is committed
+            chunked_uploads.discard(upload.id)
+            note_processor.wake()
+    note = db.session.get(Note, upload.note_id)
+    return jsonify(note_id=note.id, filename=note.filename, url=note_url(note))
+
+# --- Incremental task sync: every change bumps Project.task_version and is sent as a versioned delta ---
+@app.template_global()
+def username_of(user_id):
+    user = identity_cache.get(user_id) if user_id is not None else None
+    return user.username if user else None
+
+
+def task_delta(task):
+    """JSON form of a task for the tasks endpoint and `task_changed` events (usernames from the identity cache)."""
+    return {
+        "id": task.id,
+        "project_id": task.project_id,
+        "title": task.title,
+        "assigned_to": task.assigned_to,
+        "assignee_username": username_of(task.assigned_to),
+        "due_date": task.due_date.isoformat() if task.due_date else None,
+        "submitted": bool(task.submitted),
+        "submitted_at": task.submitted_at.isoformat() if task.submitted_at else None,
+        "submitted_by": task.submitted_by,
+        "submitter_username": username_of(task.submitted_by),
+        "version": task.version,
+    }
+
+
+def commit_task_changes(project_id, tasks):
+    """Stamp new or changed `tasks` of one project with the project's next task version,
+    commit, and emit one `task_changed` delta per task to the project's room.
+    Returns the deltas. Costs one UPDATE plus the task writes, whatever the project size."""
+    # The UPDATE holds the project row (SQLite: the write lock) until commit, so versions commit in order
+    # and a client that has seen version V can never miss a change that commits later with a lower one
+    version = db.session.execute(
+        update(Project).where(Project.id == project_id)
+        .values(task_version=Project.task_version + 1).returning(Project.task_version)
+    ).scalar_one()
+    for task in tasks:
+        task.version = version
+    db.session.flush()
+    # Serialize before commit expires the tasks (which would re-SELECT each one)
+    deltas = [task_delta(task) for task in tasks]
+    db.session.commit()
+    for delta in deltas:
+        socketio.emit('task_changed', {'project_id': project_id, 'version': version, 'task': delta},
+                      to=project_room(project_id))
+    return deltas
+
+
+def wants_json():
+    return request.accept_mimetypes.best == "application/json"
+
+
+@app.route("/team-projects/<int:project_id>/tasks")
+def project_tasks(project_id):
+    """JSON tasks of a project with its current task version: all of them, or with ?since=<version>
+    only those changed after it. The ETag is the version, so polling an unchanged project gets a 304."""
+    if "user_id" not in session:
+        return jsonify(error="Login required"), 401
+    is_member = ProjectMember.query.filter_by(project_id=project_id, user_id=session["user_id"]).first()
+    if not is_member:
+        return jsonify(error="Access denied"), 403
+
+    version = db.session.execute(select(Project.task_version).where(Project.id == project_id)).scalar()
+    etag = f"tasks-{project_id}-{version}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        query = Task.query.filter(Task.project_id == project_id)
+        since = request.args.get("since", type=int)
+        if since is not None:
+            query = query.filter(Task.version > since)
+        tasks = query.order_by(Task.version, Task.id).all()
+        response = jsonify(version=version, tasks=[task_delta(task) for task in tasks])
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
 
 @app.route("/tasks/<int:project_id>", methods=["POST"])
 def add_task(project_id):
+    """Add a task; answers JSON (the delta) to `Accept: application/json`, otherwise redirects."""
     if "user_id" not in session:
         return redirect(url_for("login"))
 
-    project = Project.query.get(project_id)
+    project = db.session.get(Project, project_id)
     if not project:
         return "Project not found", 404
 
@@ -306,16 +920,21 @@ def add_task(project_id):
             due_date=due_date
         )
         db.session.add(task)
-        db.session.commit()
+        delta, = commit_task_changes(project_id, [task])
+        if wants_json():
+            return jsonify(delta), 201
+    elif wants_json():
+        return jsonify(error="Title is required"), 400
 
     return redirect(url_for("view_team_project", project_id=project_id, _anchor='tasks')) # Redirect to detailed view
 
 @app.route("/submit-task/<int:task_id>", methods=["POST"])
 def submit_task(task_id):
+    """Mark a task submitted; answers JSON (the delta) to `Accept: application/json`, otherwise redirects."""
     if "user_id" not in session:
         return redirect(url_for("login"))
 
-    task = Task.query.get(task_id)
+    task = db.session.get(Task, task_id)
     if not task:
         return "Task not found", 404
         
@@ -327,35 +946,76 @@ def submit_task(task_id):
     task.submitted = True
     task.submitted_at = datetime.utcnow()
     task.submitted_by = session["user_id"]
-    db.session.commit()
-    
-    submitter = User.query.get(session["user_id"])
-    
-    # Emit a global broadcast for the change for live update
-    socketio.emit('task_submitted', {
-        'task_id': task.id,
-        'project_id': task.project_id,
-        'submitter_username': submitter.username,
-        'submitted_at_date': task.submitted_at.strftime('%Y-%m-%d')
-    }, broadcast=True)
+    # Members see the change live through the versioned `task_changed` event
+    delta, = commit_task_changes(task.project_id, [task])
+    if wants_json():
+        return jsonify(delta)
+
+    return redirect(url_for("view_team_project", project_id=delta["project_id"], _anchor='tasks')) # Redirect to detailed view
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with `prefix` (for index range scans),
+    or None when there is none (the prefix is all U+10FFFF), meaning the range has no upper end."""
+    # Nothing follows the highest code point, so drop those and increment the character before
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return None
+    following = ord(stem[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000  # surrogates can't be stored; U+E000 is the next character that can
+    return stem[:-1] + chr(following)
+
 
-    return redirect(url_for("view_team_project", project_id=task.project_id, _anchor='tasks')) # Redirect to detailed view
+@app.route("/team-projects/<int:project_id>/invite-candidates")
+def invite_candidates(project_id):
+    """JSON usernames starting with ?q=<prefix> (case-sensitive) that are not members of the project,
+    in username order, at most INVITE_CANDIDATE_LIMIT of them."""
+    if "user_id" not in session:
+        return jsonify(error="Login required"), 401
+    is_member = ProjectMember.query.filter_by(project_id=project_id, user_id=session["user_id"]).first()
+    if not is_member:
+        return jsonify(error="Access denied"), 403
+    prefix = request.args.get("q", "").strip()
+    if not prefix:
+        return jsonify(users=[])
+
+    # A range on username walks an index on it (LIKE alone can't use one on SQLite, where LIKE is
+    # case-insensitive). The range only holds every name with the prefix under byte-order collation:
+    # SQLite's default BINARY, and on PostgreSQL an explicit COLLATE "C" with its index from
+    # migration 10, since a locale collation can sort such names outside it. startswith() only
+    # removes names inside the range that lack the prefix.
+    username = User.username
+    if db.session.get_bind().dialect.name == "postgresql":
+        username = User.username.collate("C")
+    is_member_of_project = select(ProjectMember.id).where(
+        ProjectMember.project_id == project_id, ProjectMember.user_id == User.id
+    ).exists()
+    in_range = [username >= prefix]
+    upper_bound = prefix_upper_bound(prefix)
+    if upper_bound is not None:
+        in_range.append(username < upper_bound)
+    users = db.session.execute(
+        select(User.id, User.username)
+        .where(*in_range, User.username.startswith(prefix, autoescape=True), ~is_member_of_project)
+        .order_by(username).limit(app.config["INVITE_CANDIDATE_LIMIT"])
+    ).all()
+    return jsonify(users=[{"id": user.id, "username": user.username} for user in users])
 
 
 @app.route("/projects/<int:project_id>/invite", methods=["POST"])
 def invite_member(project_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
-    username = request.form["username"]
-    user = User.query.filter_by(username=username).first()
-    project = Project.query.get(project_id)
-    
-    if user and project:
-        existing = ProjectMember.query.filter_by(project_id=project_id, user_id=user.id).first()
-        if not existing:
-            member = ProjectMember(project_id=project_id, user_id=user.id)
-            db.session.add(member)
-            db.session.commit()
+    project = db.session.get(Project, project_id)
+    if not project:
+        return "Project not found", 404
+
+    # Several usernames may be invited at once; they are all added in one INSERT ... SELECT
+    usernames = [u.strip() for u in request.form.getlist("username") if u.strip()]
+    if usernames:
+        add_project_members(project_id, select(User.id).where(User.username.in_(usernames)))
+        db.session.commit()
     
     if project.is_team:
         # Redirect to the new team project view
@@ -364,38 +1024,96 @@ def invite_member(project_id):
         # Keep old redirect for personal projects
         return redirect(url_for("view_project", project_id=project_id))
 
+def socket_membership(data, joined=False):
+    """(user_id, project_id) for a socket event from a member of data['project_id'], else None.
+    The user is always the session's; ids sent by the client are never trusted for identity.
+    With `joined`, the socket must be in the project's room instead, which join_project only
+    allows members into; that costs no query, for events sent as often as chat messages."""
+    user_id = session.get("user_id")
+    project_id = data.get('project_id') if isinstance(data, dict) else None
+    if user_id is None or not isinstance(project_id, int):
+        return None
+    if joined:
+        return (user_id, project_id) if project_room(project_id) in rooms() else None
+    is_member = ProjectMember.query.filter_by(project_id=project_id, user_id=user_id).first()
+    if not is_member:
+        return None
+    return user_id, project_id
+
+# Clients join their project's room when the team project or chat page loads
+@socketio.on('join_project')
+@metrics.socket_handler('join_project')
+def handle_join_project(data):
+    membership = socket_membership(data)
+    if membership is None:
+        return False
+    join_room(project_room(membership[1]))
+    return True
+
 # 🌟 FIX: Real-time chat handler corrected to include username and color class
 @socketio.on('send_message')
+@metrics.socket_handler('send_message')
 def handle_send_message(data):
-    msg = Message(sender_id=data['sender_id'], project_id=data['project_id'], text=data['text'])
-    db.session.add(msg)
-    db.session.commit()
-    
-    # Fetch user and calculate color class for real-time display
-    user = User.query.get(msg.sender_id)
-    color_classes = ["text-primary", "text-success", "text-danger", "text-warning", "text-info"]
-    color_class = color_classes[user.id % len(color_classes)] 
-
-    emit('new_message', {
-        'sender_id': msg.sender_id,
-        'username': user.username,  # ✅ Added username
+    membership = socket_membership(data, joined=True)
+    if membership is None:
+        return False
+    sender_id, project_id = membership
+    # Rejected here rather than by the database, where a bad row would fail the writer's whole batch
+    text = data.get('text')
+    if not isinstance(text, str) or not text.strip():
+        return False
+    # Username and color class come from the sender cache, not a query per message
+    try:
+        username, color_class = chat_sender(sender_id)
+    except LookupError:
+        return False
+    timestamp = datetime.utcnow()
+
+    # The row is written by the group-commit writer, which also emits it
+    # to the project's room according to CHAT_DELIVERY_MODE
+    message_writer.submit({
+        'sender_id': sender_id,
+        'project_id': project_id,
+        'text': text,
+        'timestamp': timestamp
+    }, {
+        'sender_id': sender_id,
+        'project_id': project_id,
+        'username': username,  # ✅ Added username
         'color_class': color_class, # ✅ Added color class
-        'text': msg.text,
-        'timestamp': msg.timestamp.strftime('%H:%M')
-    }, broadcast=True)
+        'text': text,
+        'timestamp': timestamp.strftime('%H:%M')
+    }, sid=request.sid)
+    return True
 
 # Real-time task handler (Not used in provided templates, but kept for completeness)
 @socketio.on('add_task')
+@metrics.socket_handler('add_task')
 def handle_add_task(data):
-    task = Task(title=data['title'], project_id=data['project_id'], assigned_to=data['assigned_to'])
+    membership = socket_membership(data)
+    if membership is None:
+        return False
+    user_id, project_id = membership
+    # Invalid input is acknowledged as (False, reason)
+    title = data.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return False, "A title is required"
+    if len(title) > Task.title.type.length:
+        return False, "Title is too long"
+    # Assign to the sender unless another member of the project is named
+    assigned_to = data.get('assigned_to', user_id)
+    if not isinstance(assigned_to, int) or isinstance(assigned_to, bool):
+        return False, "Invalid assignee"
+    if assigned_to != user_id and not ProjectMember.query.filter_by(project_id=project_id, user_id=assigned_to).first():
+        return False, "The assignee is not a member of this project"
+    task = Task(title=title, project_id=project_id, assigned_to=assigned_to)
     db.session.add(task)
-    db.session.commit()
-    emit('new_task', {
-        'title': task.title,
-        'assigned_to': task.assigned_to
-    }, broadcast=True)
+    commit_task_changes(project_id, [task])
+    return True
 
 # Final block to run the app
 if __name__ == "__main__":
     create_tables()
+    # Resume processing left unfinished by the previous run
+    note_processor.start()
     socketio.run(app, debug=True)
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""Multi-row Core inserts in fixed-size batches, for loading many rows at once
+(seed_data.py, project import) without an ORM object per row."""
+
+BATCH_SIZE = 10000
+
+
+def insert_batches(session, table, rows, batch_size=BATCH_SIZE):
+    """executemany() `rows` into `table`, `batch_size` at a time; returns the row count."""
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            session.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        session.execute(table.insert(), batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,474 @@
+"""Micro-benchmarks for CollabrateEd.
+
+Run from the CollabrateEd folder, e.g.:
+
+    python benchmarks.py fanout --clients 50 100 200 --projects 20 --messages 200
+    python benchmarks.py mixed --writers 4 --readers 8 --seconds 10
+    DATABASE_URL=postgresql://... python benchmarks.py mixed --database-url ""
+    python benchmarks.py scaleout --workers 2 4 --message-queue redis://localhost:6379/0
+    python benchmarks.py scaleout --workers 1 --server werkzeug    # dev server; not the deployment
+    python benchmarks.py routes --requests 200 --users 2000 --projects 400 --messages 500
+    python benchmarks.py chat --messages 2000
+
+Benchmarks that write use a scratch database (--database-url, default a
+SQLite file under instance/), never instance/database.db. The app is
+imported after the database URL is set, so DATABASE_URL and the SQLITE_* /
+DB_POOL_* settings select the engine profile being measured. `routes` and
+`chat` fill an empty scratch database with seed_data.py first.
+
+Every benchmark prints one JSON object per line, so runs can be saved and
+compared (e.g. `python benchmarks.py routes > before.jsonl`).
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+# --- Socket.IO emit fan-out: project rooms vs. global broadcast ---
+def bench_fanout(clients, projects, messages):
+    """Emit `messages` chat events spread across `projects` and report the
+    time spent emitting and how many packets clients had to receive, once as a
+    global broadcast and once scoped to each project's room."""
+    from app import app, socketio, project_room
+
+    test_clients = []
+    for i in range(clients):
+        client = socketio.test_client(app)
+        # Join the room server-side; the membership check is not what we measure
+        sid = client.eio_sid
+        socketio.server.enter_room(socketio.server.manager.sid_from_eio_sid(sid, "/"),
+                                   project_room(i % projects), namespace="/")
+        test_clients.append(client)
+
+    results = {}
+    for mode in ("broadcast", "room"):
+        for client in test_clients:
+            client.get_received()
+        start = time.perf_counter()
+        for m in range(messages):
+            payload = {"project_id": m % projects, "text": "benchmark"}
+            if mode == "broadcast":
+                socketio.emit("new_message", payload)
+            else:
+                socketio.emit("new_message", payload, to=project_room(m % projects))
+        elapsed = time.perf_counter() - start
+        delivered = sum(len(client.get_received()) for client in test_clients)
+        results[mode] = {
+            "emit_seconds": round(elapsed, 4),
+            "packets_delivered": delivered,
+            "packets_per_message": round(delivered / messages, 2),
+        }
+
+    for client in test_clients:
+        client.disconnect()
+    return results
+
+
+# --- Mixed chat writes and dashboard reads against the configured engine profile ---
+def percentile(samples, pct):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def seed_mixed(db, users, projects):
+    """Small fixed dataset: every user in every project (enough for realistic dashboard reads)."""
+    from models import User, Project, ProjectMember
+
+    if User.query.filter(User.username.like("bench_%")).count():
+        return [u.id for u in User.query.filter(User.username.like("bench_%"))], \
+               [p.id for p in Project.query.filter(Project.name.like("bench_%"))]
+    db.session.add_all([User(username=f"bench_{i}", password="bench") for i in range(users)])
+    db.session.flush()
+    user_ids = [u.id for u in User.query.filter(User.username.like("bench_%"))]
+    db.session.add_all([Project(name=f"bench_{i}", owner_id=user_ids[0], is_team=True) for i in range(projects)])
+    db.session.flush()
+    project_ids = [p.id for p in Project.query.filter(Project.name.like("bench_%"))]
+    db.session.add_all([ProjectMember(project_id=p, user_id=u) for p in project_ids for u in user_ids])
+    db.session.commit()
+    return user_ids, project_ids
+
+
+def bench_mixed(writers, readers, seconds, users=50, projects=20):
+    """Writer threads commit one chat message per transaction (the unbatched
+    worst case) while reader threads build dashboards; reports throughput,
+    latency percentiles and lock errors for each side."""
+    from app import app, db, create_tables, build_dashboard_data
+    from models import Message
+
+    create_tables()
+    with app.app_context():
+        user_ids, project_ids = seed_mixed(db, users, projects)
+        profile = {"dialect": db.engine.dialect.name}
+        if profile["dialect"] == "sqlite":
+            profile["journal_mode"] = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+            profile["synchronous"] = app.config["SQLITE_SYNCHRONOUS"]
+        else:
+            profile["pool_size"] = app.config["DB_POOL_SIZE"]
+
+    stop = time.monotonic() + seconds
+    results = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+
+    def worker(kind):
+        latencies, failed = [], 0
+        with app.app_context():
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                try:
+                    if kind == "write":
+                        db.session.add(Message(sender_id=random.choice(user_ids),
+                                               project_id=random.choice(project_ids), text="benchmark"))
+                        db.session.commit()
+                    else:
+                        build_dashboard_data(random.choice(user_ids))
+                        db.session.rollback()
+                except Exception:
+                    db.session.rollback()
+                    failed += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+        with lock:
+            results[kind].extend(latencies)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=("write",)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=("read",)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = {"profile": profile}
+    for kind in ("write", "read"):
+        samples = results[kind]
+        report[kind] = {
+            "ops_per_sec": round(len(samples) / seconds, 1),
+            "errors": errors[kind],
+            "p50_ms": round(percentile(samples, 50) * 1000, 2) if samples else None,
+            "p95_ms": round(percentile(samples, 95) * 1000, 2) if samples else None,
+            "p99_ms": round(percentile(samples, 99) * 1000, 2) if samples else None,
+        }
+    return report
+
+
+# --- Per-route latency and SQL counts, and send_message throughput, on seeded data ---
+@contextmanager
+def count_queries(engine):
+    """Yields a one-item list holding the number of SQL statements executed on `engine` so far."""
+    from sqlalchemy import event
+
+    count = [0]
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield count
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def seeded_user(db, seed_sizes):
+    """(username, ids of the user's projects) for the seeded user in the most projects, seeding first if needed."""
+    from models import User, ProjectMember
+    from seed_data import seed
+
+    if not User.query.filter(User.username.like("seed_%")).count():
+        seed(db, **seed_sizes)
+    user_id, _ = db.session.execute(
+        db.select(ProjectMember.user_id, db.func.count())
+        .join(User, User.id == ProjectMember.user_id).where(User.username.like("seed_%"))
+        .group_by(ProjectMember.user_id).order_by(db.func.count().desc()).limit(1)
+    ).one()
+    project_ids = db.session.execute(
+        db.select(ProjectMember.project_id).where(ProjectMember.user_id == user_id)
+    ).scalars().all()
+    return db.session.get(User, user_id).username, project_ids
+
+
+def latency_summary(samples):
+    return {f"p{pct}_ms": round(percentile(samples, pct) * 1000, 2) if samples else None for pct in (50, 95, 99)}
+
+
+def bench_routes(requests, seed_sizes):
+    """Request each main page `requests` times as the seeded user with the most
+    projects, through the Flask test client; yields latency percentiles and SQL
+    statements per request for each route. Cached routes (the dashboard) show
+    their hit cost; `sql_first` is the cost of the first, uncached request."""
+    from app import app, db, create_tables
+
+    create_tables()
+    with app.app_context():
+        username, project_ids = seeded_user(db, seed_sizes)
+        engine = db.engine
+
+    client = app.test_client()
+    client.post("/", data={"username": username, "password": "seed"})
+    project_id = project_ids[0]
+    routes = [
+        ("dashboard", "/dashboard"),
+        ("profile", "/profile"),
+        ("view_team_project", f"/team-projects/{project_id}"),
+        ("project_messages", f"/team-projects/{project_id}/messages"),
+        ("search", "/search?q=lab%20report"),
+    ]
+    for name, url in routes:
+        latencies, queries = [], []
+        for _ in range(requests):
+            with count_queries(engine) as count:
+                start = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}")
+            queries.append(count[0])
+        yield {
+            "route": name,
+            "requests": requests,
+            **latency_summary(latencies),
+            "sql_first": queries[0],
+            "sql_p50": percentile(queries, 50),
+            "sql_max": max(queries),
+        }
+
+
+def bench_chat(messages, seed_sizes, timeout=60):
+    """Send `messages` chat messages from one Socket.IO test client and wait
+    until every `new_message` has come back to it; reports messages/sec end to
+    end (handler, group-commit writer, room emit) and SQL statements used."""
+    from app import app, db, create_tables, socketio, message_writer
+
+    create_tables()
+    with app.app_context():
+        username, project_ids = seeded_user(db, seed_sizes)
+        engine = db.engine
+
+    http = app.test_client()
+    http.post("/", data={"username": username, "password": "seed"})
+    client = socketio.test_client(app, flask_test_client=http)
+    client.emit("join_project", {"project_id": project_ids[0]})
+    client.get_received()
+
+    received = 0
+    with count_queries(engine) as count:
+        start = time.perf_counter()
+        for m in range(messages):
+            client.emit("send_message", {"project_id": project_ids[0], "text": f"bench {m}"})
+        submitted = time.perf_counter() - start
+        deadline = time.monotonic() + timeout
+        while received < messages and time.monotonic() < deadline:
+            received += sum(1 for packet in client.get_received() if packet["name"] == "new_message")
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+    client.disconnect()
+    return {
+        "messages": messages,
+        "delivered": received,
+        "delivery_mode": message_writer.delivery,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(received / elapsed, 1),
+        "submit_per_sec": round(messages / submitted, 1),
+        "sql_statements": count[0],
+    }
+
+
+# --- Socket.IO throughput as the number of worker processes grows ---
+def serve(port):
+    """Run one werkzeug worker process in threading mode (scaleout --server werkzeug)."""
+    from app import app, socketio
+
+    socketio.run(app, host="127.0.0.1", port=port, allow_unsafe_werkzeug=True)
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+
+def server_command(server, port):
+    """Command line for one instance: "gunicorn" is the deployment (gunicorn.conf.py, one eventlet or
+    gevent worker); "werkzeug" is the development server, whose numbers say nothing about it."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "-c", os.path.join(here, "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{port}", "app:app"]
+    return [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)]
+
+
+def bench_scaleout(workers, clients, projects, messages, message_queue, server="gunicorn", base_port=5100,
+                   timeout=120):
+    """Start `workers` server instances sharing `message_queue`, spread
+    Socket.IO clients over them round-robin, have every client send
+    `messages` chat messages to its project's room and measure how fast all
+    resulting deliveries arrive. Requires python-socketio's client extras
+    (requests, websocket-client), and for --server gunicorn, Gunicorn and
+    the async library gunicorn.conf.py selects (SOCKETIO_ASYNC_MODE)."""
+    import requests
+    import socketio as socketio_client
+    from app import app, db, create_tables
+
+    if workers > 1 and (not message_queue or message_queue == "local://"):
+        raise SystemExit("More than one worker needs a cross-process --message-queue (e.g. redis://...)")
+    async_mode = os.environ.get("SOCKETIO_ASYNC_MODE", "eventlet") if server == "gunicorn" else "threading"
+    if server == "gunicorn":
+        missing = [m for m in ("gunicorn", async_mode) if importlib.util.find_spec(m) is None]
+        if missing:
+            raise SystemExit(f"--server gunicorn needs {', '.join(missing)} installed")
+
+    create_tables()
+    with app.app_context():
+        _, project_ids = seed_mixed(db, clients, projects)
+
+    env = dict(os.environ, SOCKETIO_MESSAGE_QUEUE=message_queue or "", SOCKETIO_ASYNC_MODE=async_mode,
+               NOTE_WORKERS="0")
+    procs = [subprocess.Popen(server_command(server, base_port + i), cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+             for i in range(workers)]
+    connected = []
+    try:
+        for i in range(workers):
+            wait_for_port(base_port + i)
+
+        received = [0]
+        lock = threading.Lock()
+
+        def on_message(data):
+            with lock:
+                received[0] += 1
+
+        room_sizes = {}
+        for i in range(clients):
+            url = f"http://127.0.0.1:{base_port + i % workers}"
+            http = requests.Session()
+            http.post(f"{url}/", data={"username": f"bench_{i}", "password": "bench"}, allow_redirects=False)
+            client = socketio_client.Client(http_session=http)
+            client.on("new_message", on_message)
+            client.connect(url, transports=["websocket"])
+            project_id = project_ids[i % len(project_ids)]
+            client.call("join_project", {"project_id": project_id})
+            room_sizes[project_id] = room_sizes.get(project_id, 0) + 1
+            connected.append((client, project_id))
+
+        expected = sum(messages * room_sizes[project_id] for _, project_id in connected)
+        start = time.perf_counter()
+        for m in range(messages):
+            for client, project_id in connected:
+                client.emit("send_message", {"project_id": project_id, "text": f"bench {m}"})
+        deadline = time.monotonic() + timeout
+        while received[0] < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        return {
+            "server": "gunicorn" if server == "gunicorn" else "werkzeug (development server, not the deployment)",
+            "async_mode": async_mode,
+            "sent": messages * clients,
+            "deliveries_expected": expected,
+            "deliveries_received": received[0],
+            "seconds": round(elapsed, 3),
+            "deliveries_per_sec": round(received[0] / elapsed, 1),
+        }
+    finally:
+        for client, _ in connected:
+            client.disconnect()
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CollabrateEd benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fanout = sub.add_parser("fanout", help="Socket.IO emit fan-out vs. connected clients")
+    fanout.add_argument("--clients", type=int, nargs="+", default=[50, 100, 200])
+    fanout.add_argument("--projects", type=int, default=20)
+    fanout.add_argument("--messages", type=int, default=200)
+
+    mixed = sub.add_parser("mixed", help="Concurrent chat writes and dashboard reads")
+    mixed.add_argument("--writers", type=int, default=4)
+    mixed.add_argument("--readers", type=int, default=8)
+    mixed.add_argument("--seconds", type=float, default=10)
+    mixed.add_argument("--database-url", default="sqlite:///" + os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "instance", "benchmark.db"),
+        help='scratch database; pass "" to use DATABASE_URL from the environment')
+
+    scaleout = sub.add_parser("scaleout", help="Chat delivery throughput from 1 to N worker processes")
+    scaleout.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    scaleout.add_argument("--clients", type=int, default=40)
+    scaleout.add_argument("--projects", type=int, default=4)
+    scaleout.add_argument("--messages", type=int, default=20)
+    scaleout.add_argument("--message-queue", default=os.environ.get("SOCKETIO_MESSAGE_QUEUE"))
+    scaleout.add_argument("--server", choices=["gunicorn", "werkzeug"], default="gunicorn",
+                          help="gunicorn: instances as deployed by gunicorn.conf.py; werkzeug: dev server only")
+    scaleout.add_argument("--database-url", default="sqlite:///" + os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "instance", "benchmark.db"))
+
+    def add_seed_arguments(cmd):
+        cmd.add_argument("--users", type=int, default=1000)
+        cmd.add_argument("--projects", type=int, default=200)
+        cmd.add_argument("--members", type=int, default=8)
+        cmd.add_argument("--tasks", type=int, default=20)
+        cmd.add_argument("--seed-messages", type=int, default=200, help="chat messages per seeded project")
+        cmd.add_argument("--database-url", default="sqlite:///" + os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "instance", "benchmark.db"))
+
+    routes = sub.add_parser("routes", help="Latency and SQL statements per route on seeded data")
+    routes.add_argument("--requests", type=int, default=100)
+    add_seed_arguments(routes)
+
+    chat = sub.add_parser("chat", help="send_message throughput through the Socket.IO test client")
+    chat.add_argument("--messages", type=int, default=1000)
+    add_seed_arguments(chat)
+
+    serve_cmd = sub.add_parser("serve", help=argparse.SUPPRESS)
+    serve_cmd.add_argument("--port", type=int, required=True)
+
+    args = parser.parse_args()
+    if getattr(args, "database_url", None):
+        os.environ["DATABASE_URL"] = args.database_url
+
+    if args.command == "mixed":
+        print(json.dumps({"benchmark": "mixed", "writers": args.writers, "readers": args.readers,
+                          "seconds": args.seconds, **bench_mixed(args.writers, args.readers, args.seconds)}))
+    elif args.command == "scaleout":
+        for n in args.workers:
+            print(json.dumps({"benchmark": "scaleout", "workers": n, "clients": args.clients,
+                              "message_queue": args.message_queue,
+                              **bench_scaleout(n, args.clients, args.projects, args.messages, args.message_queue,
+                                             args.server)}))
+    elif args.command in ("routes", "chat"):
+        seed_sizes = {"users": args.users, "projects": args.projects, "members": args.members,
+                      "tasks": args.tasks, "messages": args.seed_messages}
+        if args.command == "routes":
+            for result in bench_routes(args.requests, seed_sizes):
+                print(json.dumps({"benchmark": "routes", **result}))
+        else:
+            print(json.dumps({"benchmark": "chat", **bench_chat(args.messages, seed_sizes)}))
+    elif args.command == "serve":
+        serve(args.port)
+    elif args.command == "fanout":
+        for n in args.clients:
+            print(json.dumps({"benchmark": "fanout", "clients": n, "projects": args.projects,
+                              "messages": args.messages,
+                              **bench_fanout(n, args.projects, args.messages)}))
+
+
+if __name__ == "__main__":
+    main()
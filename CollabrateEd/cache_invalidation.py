@@ -0,0 +1,43 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class CommitTracker:
+    """Invalidation hooks shared by the in-process caches.
+
+    On every flush, `keys_for(obj)` names the cache keys each new, changed or
+    deleted object affects; they are held in the session until it commits and
+    then passed to `apply(keys)` as one set. A rollback discards them, so a
+    cache never drops entries for a change that didn't happen. Only this
+    process's commits are seen; a cache's TTL bounds staleness from writes
+    made by other processes.
+    """
+
+    def __init__(self, name, keys_for, apply):
+        self.info_key = f"{name}_changes"
+        self.keys_for = keys_for
+        self.apply = apply
+
+    def install(self):
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def add(self, session, keys):
+        """Note keys changed in `session` by statements the flush hook can't see (e.g. bulk
+        inserts); they are applied when the session commits."""
+        session.info.setdefault(self.info_key, set()).update(keys)
+
+    def _after_flush(self, session, flush_context):
+        keys = [key for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+                for key in self.keys_for(obj)]
+        if keys:
+            self.add(session, keys)
+
+    def _after_commit(self, session):
+        keys = session.info.pop(self.info_key, None)
+        if keys:
+            self.apply(keys)
+
+    def _after_rollback(self, session):
+        session.info.pop(self.info_key, None)
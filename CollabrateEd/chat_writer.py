@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from models import db, Message
+
+# Queued by close(): the writer stops once everything queued before it is written
+_CLOSE = object()
+
+
+class MessageWriter:
+    """Group-commit writer for chat messages.
+
+    Socket handlers hand messages to `submit()` and return straight away. A
+    background task collects whatever is pending and writes it in a single
+    transaction once `max_batch` messages are queued or `flush_interval_ms`
+    has passed since the first one, so SQLite pays one fsync per batch instead
+    of one per message.
+
+    Delivery modes (CHAT_DELIVERY_MODE):
+      - "durable": `new_message` is emitted only after the batch holding the
+        message has committed. Clients never see a message that could be lost;
+        emits follow commit order, which is arrival order.
+      - "fast": `new_message` is emitted as soon as the message is submitted and
+        persisted with the next batch. Lowest latency, but a crash before the
+        flush loses up to one batch of already-delivered messages.
+
+    Both modes keep per-project ordering: there is a single queue and a single
+    writer, and timestamps are taken on arrival.
+
+    A row the database rejects fails its whole batch; the batch is then
+    retried one message at a time, so only the bad message is dropped and
+    only its sender gets `message_error`. Any other error is logged and the
+    writer carries on with the next batch. `close()` (run at exit) writes
+    whatever is still queued.
+    """
+
+    DELIVERY_MODES = ("durable", "fast")
+
+    def __init__(self, app, socketio, room_for, flush_interval_ms=5, max_batch=100, delivery="durable"):
+        if delivery not in self.DELIVERY_MODES:
+            raise ValueError(f"Unknown chat delivery mode: {delivery}")
+        self.app = app
+        self.socketio = socketio
+        self.room_for = room_for
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.delivery = delivery
+        self._queue = queue.Queue()
+        self._task = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the writer task once; a second writer would break arrival order."""
+        with self._start_lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def submit(self, row, payload, sid=None):
+        """Queue a Message row (a dict of column values) and its `new_message` payload."""
+        if self.delivery == "fast":
+            self.socketio.emit('new_message', payload, to=self.room_for(row['project_id']))
+        self._queue.put((row, payload, sid))
+        self.start()
+
+    def flush(self):
+        """Write everything queued so far in the calling thread (used by scripts and benchmarks)."""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] is _CLOSE:
+                item[1].set()
+            else:
+                batch.append(item)
+        if batch:
+            self._write(batch)
+
+    def close(self, timeout=5):
+        """Write every queued message before the process exits: the running writer is asked to
+        finish what is queued and stop (waiting up to `timeout` seconds), then anything left is
+        written in the calling thread. A later `submit()` starts a new writer."""
+        with self._start_lock:
+            running = self._task is not None
+        if running:
+            done = threading.Event()
+            self._queue.put((_CLOSE, done, None))
+            done.wait(timeout)
+        self.flush()
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch and batch[-1][0] is not _CLOSE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                closing = batch.pop() if batch[-1][0] is _CLOSE else None
+                if batch:
+                    try:
+                        self._write(batch)
+                    except Exception:
+                        # Carry on: if the writer stopped, every later message would wait in the queue forever
+                        self.app.logger.exception("Chat writer failed on a batch of %d messages", len(batch))
+                if closing is not None:
+                    closing[1].set()
+                    return
+        finally:
+            # However the writer ends, the next submit() starts a new one
+            with self._start_lock:
+                self._task = None
+
+    def _insert(self, batch):
+        """Insert `batch` in one transaction; returns the new ids, or None if it was rolled back."""
+        messages = [Message(**row) for row, _, _ in batch]
+        try:
+            db.session.add_all(messages)
+            db.session.flush()
+            # Read the new ids before commit expires the objects, or each would be re-SELECTed
+            ids = [message.id for message in messages]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("Failed to write a batch of %d chat messages", len(batch))
+            return None
+        return ids
+
+    def _write(self, batch):
+        with self.app.app_context():
+            ids = self._insert(batch)
+            if ids is None:
+                # Retry one by one so a single bad row doesn't drop the messages batched with it
+                ids = [None] if len(batch) == 1 else [(self._insert([item]) or [None])[0] for item in batch]
+
+            for message_id, (row, payload, sid) in zip(ids, batch):
+                if message_id is None:
+                    if sid is not None:
+                        self.socketio.emit('message_error', {'error': 'Message could not be saved',
+                                                             'text': row.get('text')}, to=sid)
+                elif self.delivery == "durable":
+                    payload['id'] = message_id
+                    self.socketio.emit('new_message', payload, to=self.room_for(row['project_id']))
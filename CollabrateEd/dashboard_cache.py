@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from cache_invalidation import CommitTracker
+from models import Project, ProjectMember, Task, Message
+
+
+class DashboardCache:
+    """Per-user cache of the data behind the dashboard page.
+
+    Every committed change to a Task, Message or ProjectMember marks its
+    project (and, for memberships, the member) as changed at the current tick
+    of a monotonic counter; creating, renaming or deleting a Project marks
+    everything. A cached entry is served only if nothing it depends on changed
+    after the tick at which it started building, so no explicit "who sees this
+    project" lookup is needed.
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._tick = 0
+        self._project_changed = {}
+        self._user_changed = {}
+        self._all_changed = 0
+        self._changes = CommitTracker("dashboard", self._changed_keys, self._apply)
+
+    def start(self):
+        """Tick to pass to `set()`; take it before querying the data to cache."""
+        with self._lock:
+            return self._tick
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            built_at, expires, project_ids, data = entry
+            if (
+                expires < time.monotonic()
+                or self._all_changed > built_at
+                or self._user_changed.get(user_id, 0) > built_at
+                or any(self._project_changed.get(pid, 0) > built_at for pid in project_ids)
+            ):
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return data
+
+    def set(self, user_id, built_at, project_ids, data):
+        with self._lock:
+            self._entries[user_id] = (built_at, time.monotonic() + self.ttl, tuple(project_ids), data)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, project_ids=(), user_ids=(), everything=False):
+        with self._lock:
+            self._tick += 1
+            for pid in project_ids:
+                self._project_changed[pid] = self._tick
+            for uid in user_ids:
+                self._user_changed[uid] = self._tick
+            if everything:
+                self._all_changed = self._tick
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # --- Invalidation on commit (see cache_invalidation.py) ---
+    def track_changes(self):
+        self._changes.install()
+
+    def record(self, session, project_ids=(), user_ids=(), everything=False):
+        """Note changes made in `session` (e.g. by bulk statements the flush hook
+        can't see); they take effect when the session commits."""
+        keys = [("project", pid) for pid in project_ids] + [("user", uid) for uid in user_ids]
+        self._changes.add(session, keys + [("all", None)] if everything else keys)
+
+    @staticmethod
+    def _changed_keys(obj):
+        if isinstance(obj, (Task, Message)):
+            return [("project", obj.project_id)]
+        if isinstance(obj, ProjectMember):
+            return [("project", obj.project_id), ("user", obj.user_id)]
+        if isinstance(obj, Project):
+            return [("all", None)]
+        return []
+
+    def _apply(self, keys):
+        self.invalidate(project_ids=[key for kind, key in keys if kind == "project"],
+                        user_ids=[key for kind, key in keys if kind == "user"],
+                        everything=("all", None) in keys)
@@ -0,0 +1,65 @@
+import os
+from sqlalchemy import event
+
+# SQLite is the default; DATABASE_URL=postgresql://... switches to a pooled PostgreSQL engine.
+SQLITE_DEFAULTS = {
+    # WAL lets readers keep going while a chat batch commits
+    "SQLITE_JOURNAL_MODE": "WAL",
+    # NORMAL is durable across application crashes in WAL mode; only an OS crash can lose the last commits
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    # Wait for a lock instead of failing with "database is locked"
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+    "SQLITE_MMAP_BYTES": 256 * 1024 * 1024,
+    "SQLITE_CACHE_KB": 64 * 1024,
+}
+
+POSTGRES_DEFAULTS = {
+    "DB_POOL_SIZE": 10,
+    "DB_MAX_OVERFLOW": 20,
+    "DB_POOL_TIMEOUT": 30,
+    # Recycle before server/proxy idle timeouts close connections under us
+    "DB_POOL_RECYCLE": 1800,
+}
+
+
+def configure_database(app, default_uri):
+    """Set the database URI and engine options from the environment. Call before db.init_app(app)."""
+    uri = os.environ.get("DATABASE_URL", default_uri)
+    # Heroku-style URLs use the scheme SQLAlchemy dropped
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+
+    if uri.startswith("sqlite"):
+        for key, value in SQLITE_DEFAULTS.items():
+            app.config[key] = type(value)(os.environ.get(key, value))
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "connect_args": {"timeout": app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000},
+        }
+    else:
+        for key, value in POSTGRES_DEFAULTS.items():
+            app.config[key] = int(os.environ.get(key, value))
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": app.config["DB_POOL_SIZE"],
+            "max_overflow": app.config["DB_MAX_OVERFLOW"],
+            "pool_timeout": app.config["DB_POOL_TIMEOUT"],
+            "pool_recycle": app.config["DB_POOL_RECYCLE"],
+            "pool_pre_ping": True,
+        }
+
+
+def install_sqlite_pragmas(app, engine):
+    """Apply the SQLITE_* settings to every new connection. Call after db.init_app(app)."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_BYTES'])}")
+        # A negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(app.config['SQLITE_CACHE_KB'])}")
+        cursor.close()
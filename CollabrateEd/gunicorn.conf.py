@@ -0,0 +1,47 @@
+"""Gunicorn settings for the multi-process deployment.
+
+Socket.IO's long-polling transport needs every request of a client to reach
+the same process, and Gunicorn does not balance with sticky sessions, so each
+Gunicorn instance runs ONE async worker. Scale out by running N instances on
+different ports behind a proxy with sticky sessions (e.g. nginx ip_hash), all
+sharing emits through the same message queue:
+
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 PORT=5001 gunicorn -c gunicorn.conf.py app:app
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 PORT=5002 gunicorn -c gunicorn.conf.py app:app
+
+The async worker (eventlet by default, or gevent) keeps idle sockets as
+green threads instead of holding an OS thread per connection.
+
+Apply migrations once before starting the instances (`python migrations.py`);
+the app is deliberately not imported at the top of this file, because a module
+imported in the Gunicorn master would be inherited by workers before the async
+library patches the standard library. Hooks that need it import it inside the
+worker instead.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = 1
+_async_mode = os.environ.setdefault("SOCKETIO_ASYNC_MODE", "eventlet")
+worker_class = {
+    "eventlet": "eventlet",
+    "gevent": "geventwebsocket.gunicorn.workers.GeventWebSocketWorker",
+}[_async_mode]
+# Idle Socket.IO connections are cheap green threads; let each worker hold thousands
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 5000))
+timeout = 60
+
+
+def post_worker_init(worker):
+    # Runs in the worker once the app is loaded: resume note processing left unfinished by the
+    # previous run instead of waiting for the next upload to wake it
+    from app import note_processor
+
+    note_processor.start()
+
+
+def worker_exit(server, worker):
+    # Write the chat messages still queued before a worker shuts down
+    from app import message_writer
+
+    message_writer.close()
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from cache_invalidation import CommitTracker
+from models import db, User
+
+# What request handlers and templates need to know about the logged-in user.
+# A plain snapshot rather than an ORM object, so it can be shared across
+# requests and threads without being bound to any session.
+Identity = namedtuple("Identity", ["id", "username"])
+
+
+class IdentityCache:
+    """Bounded LRU of user id -> Identity with a TTL.
+
+    Entries are dropped as soon as a commit inserts, updates or deletes the
+    User row (see cache_invalidation.py).
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._changes = CommitTracker("identity", self._changed_keys, self.invalidate)
+
+    def get(self, user_id):
+        """Identity for `user_id`, loading it from the database on a miss; None if there is no such user."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = Identity(user.id, user.username)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # --- Invalidation on commit (see cache_invalidation.py) ---
+    def track_changes(self):
+        self._changes.install()
+
+    @staticmethod
+    def _changed_keys(obj):
+        return [obj.id] if isinstance(obj, User) else []
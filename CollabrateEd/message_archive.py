@@ -0,0 +1,127 @@
+"""Cold storage for old chat messages.
+
+Messages older than a cutoff are moved out of the `message` table into
+MessageArchive segments: up to `segment_size` consecutive messages of one
+project as zlib-compressed NDJSON. The hot table (and its indexes) then only
+holds recent chat, while history can still page into the archive:
+message_page(..., include_archived=True) in app.py continues with
+`archived_page()` once the hot rows run out.
+
+    python message_archive.py --older-than-days 180     # run from cron
+
+Archived messages are no longer in the search index.
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, tuple_
+from models import db, Message, MessageArchive, Project
+
+# Same attributes as a Message row, so history code can handle both
+ArchivedMessage = namedtuple("ArchivedMessage", ["id", "sender_id", "project_id", "text", "timestamp"])
+
+
+def pack(messages):
+    lines = (json.dumps({"id": m.id, "sender_id": m.sender_id, "text": m.text,
+                         "timestamp": m.timestamp.isoformat()}) for m in messages)
+    return zlib.compress("\n".join(lines).encode("utf-8"), 6)
+
+
+def unpack(segment):
+    """The segment's messages, oldest first."""
+    messages = []
+    for line in zlib.decompress(segment.data).decode("utf-8").split("\n"):
+        row = json.loads(line)
+        messages.append(ArchivedMessage(row["id"], row["sender_id"], segment.project_id, row["text"],
+                                        datetime.fromisoformat(row["timestamp"])))
+    return messages
+
+
+def archive_messages(session, cutoff, segment_size=1000):
+    """Move every message older than `cutoff` into archive segments; returns how many were moved.
+
+    Each project's oldest messages go first, one segment per transaction, so
+    the job can be stopped at any point and resumed by running it again.
+    """
+    moved = 0
+    project_ids = session.execute(select(Project.id).order_by(Project.id)).scalars().all()
+    for project_id in project_ids:
+        while True:
+            # Served by ix_message_project_timestamp_id
+            messages = session.execute(
+                select(Message).where(Message.project_id == project_id, Message.timestamp < cutoff)
+                .order_by(Message.timestamp, Message.id).limit(segment_size)
+            ).scalars().all()
+            if not messages:
+                break
+            session.add(MessageArchive(
+                project_id=project_id,
+                first_ts=messages[0].timestamp, first_id=messages[0].id,
+                last_ts=messages[-1].timestamp, last_id=messages[-1].id,
+                message_count=len(messages), data=pack(messages),
+            ))
+            session.execute(delete(Message).where(Message.id.in_([m.id for m in messages])))
+            session.commit()
+            moved += len(messages)
+            if len(messages) < segment_size:
+                break
+    return moved
+
+
+def archived_page(session, project_id, before_ts=None, before_id=None, limit=50):
+    """Up to `limit` archived messages of a project strictly before (before_ts, before_id)
+    (or the newest archived ones without a cursor), newest first."""
+    query = select(MessageArchive).where(MessageArchive.project_id == project_id)
+    if before_ts is not None and before_id is not None:
+        query = query.where(tuple_(MessageArchive.first_ts, MessageArchive.first_id) < tuple_(before_ts, before_id))
+    segments = session.execute(
+        query.order_by(MessageArchive.last_ts.desc(), MessageArchive.last_id.desc()).execution_options(yield_per=4)
+    ).scalars()
+    page = []
+    try:
+        # Only as many segments are read and decompressed as the page needs
+        for segment in segments:
+            for message in reversed(unpack(segment)):
+                if before_ts is None or (message.timestamp, message.id) < (before_ts, before_id):
+                    page.append(message)
+                    if len(page) == limit:
+                        return page
+    finally:
+        segments.close()
+    return page
+
+
+def archived_messages(session, project_id):
+    """Every archived message of a project, oldest first, one segment in memory at a time."""
+    segments = session.execute(
+        select(MessageArchive).where(MessageArchive.project_id == project_id)
+        .order_by(MessageArchive.last_ts, MessageArchive.last_id).execution_options(yield_per=4)
+    ).scalars()
+    for segment in segments:
+        yield from unpack(segment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old chat messages into compressed archive segments")
+    parser.add_argument("--older-than-days", type=int,
+                        default=int(os.environ.get("MESSAGE_ARCHIVE_AFTER_DAYS", 180)))
+    parser.add_argument("--segment-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    from app import app, create_tables
+
+    create_tables()
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+    started = time.perf_counter()
+    with app.app_context():
+        moved = archive_messages(db.session, cutoff, args.segment_size)
+    print(json.dumps({"archived": moved, "cutoff": cutoff.isoformat(),
+                      "seconds": round(time.perf_counter() - started, 2)}))
+
+
+if __name__ == "__main__":
+    main()
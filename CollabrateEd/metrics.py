@@ -0,0 +1,217 @@
+"""Request, SQL and Socket.IO handler instrumentation, exposed in Prometheus text format.
+
+Every HTTP request and instrumented socket handler is a "scope". SQLAlchemy
+engine events count and time each statement against the current scope; SQL
+run outside any scope (the chat writer, the note processor) goes to the
+collabrateed_background_* counters. At the end of a scope:
+
+- statements slower than METRICS_SLOW_QUERY_MS are logged with their timing;
+- a statement text executed METRICS_N_PLUS_ONE_THRESHOLD or more times in one
+  scope is counted as a likely N+1, and logged the first time it is seen for
+  that route or event.
+
+Recording is a few dict updates under a lock, cheap enough to leave on.
+Metrics are per process; with several Gunicorn instances, scrape each one.
+"""
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from flask import request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Scope:
+    __slots__ = ("kind", "name", "started", "statements", "sql_seconds", "slow")
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started = time.perf_counter()
+        self.statements = Counter()
+        self.sql_seconds = 0.0
+        self.slow = []
+
+
+class Metrics:
+    def __init__(self, slow_query_ms=200, n_plus_one_threshold=10, logger=None):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.logger = logger
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._reported_n_plus_one = set()
+
+    # --- recording ---
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def begin(self, kind, name):
+        self._local.scope = _Scope(kind, name)
+
+    def end(self, status=None):
+        scope = getattr(self._local, "scope", None)
+        if scope is None:
+            return
+        self._local.scope = None
+        elapsed = time.perf_counter() - scope.started
+        labels = (("kind", scope.kind), ("name", scope.name))
+        if status is not None:
+            self._inc("collabrateed_requests_total", labels + (("status", str(status)),))
+        self._observe("collabrateed_scope_seconds", labels, elapsed, LATENCY_BUCKETS)
+        self._observe("collabrateed_scope_sql_statements", labels, sum(scope.statements.values()),
+                      QUERY_COUNT_BUCKETS)
+        self._inc("collabrateed_sql_seconds_total", labels, scope.sql_seconds)
+
+        for statement, seconds in scope.slow:
+            self._log("warning", "Slow query in %s %s (%.0f ms): %s",
+                      scope.kind, scope.name, seconds * 1000, statement[:500])
+        for statement, count in scope.statements.items():
+            if count >= self.n_plus_one_threshold:
+                self._inc("collabrateed_repeated_statements_total", labels)
+                key = (scope.kind, scope.name, statement)
+                if key not in self._reported_n_plus_one:
+                    # Logged once per statement; the counter keeps track after that
+                    self._reported_n_plus_one.add(key)
+                    self._log("warning", "Possible N+1 in %s %s: statement ran %d times: %s",
+                              scope.kind, scope.name, count, statement[:500])
+
+    def _log(self, level, *args):
+        if self.logger is not None:
+            getattr(self.logger, level)(*args)
+
+    # --- SQLAlchemy engine events ---
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        scope = getattr(self._local, "scope", None)
+        if scope is None:
+            self._inc("collabrateed_background_sql_statements_total", ())
+            self._inc("collabrateed_background_sql_seconds_total", (), seconds)
+        else:
+            scope.statements[statement] += 1
+            scope.sql_seconds += seconds
+        if seconds >= self.slow_query_seconds:
+            self._inc("collabrateed_slow_queries_total", ())
+            if scope is None:
+                self._log("warning", "Slow background query (%.0f ms): %s", seconds * 1000, statement[:500])
+            else:
+                scope.slow.append((statement, seconds))
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    # --- wiring ---
+    def install(self, app, engine):
+        """Time every Flask request and every statement run on `engine`."""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+        @app.before_request
+        def begin_request_scope():
+            # The URL rule, not the URL, so ids don't create a label per project
+            self.begin("http", request.url_rule.rule if request.url_rule else "unmatched")
+
+        @app.after_request
+        def end_request_scope(response):
+            self.end(status=response.status_code)
+            return response
+
+        @app.teardown_request
+        def end_failed_request_scope(exc):
+            # after_request is skipped when a view raises
+            if exc is not None:
+                self.end(status=500)
+
+    def socket_handler(self, event_name):
+        """Decorator timing a Socket.IO handler (and its SQL) as scope kind="socket"."""
+        def decorator(handler):
+            @wraps(handler)
+            def wrapper(*args, **kwargs):
+                self.begin("socket", event_name)
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    self.end()
+            return wrapper
+        return decorator
+
+    # --- exposition ---
+    def render(self):
+        """All metrics in Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.sum, h.count, h.buckets) for key, h in histograms]
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), counts, total, count, buckets in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
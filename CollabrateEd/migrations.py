@@ -0,0 +1,319 @@
+"""Schema migrations applied on top of db.create_all().
+
+create_all() only creates missing tables, so anything added to an existing
+table (indexes, columns) goes here as a numbered migration. Applied versions
+are recorded in `schema_migrations`, and every step is written so it is also
+a no-op on a fresh database that create_all() has just built.
+
+    python migrations.py          # apply pending migrations
+    python migrations.py check    # EXPLAIN QUERY PLAN regression checks (SQLite)
+"""
+import sys
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+
+def create_index(conn, name, table, columns, unique=False):
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+
+def add_column(conn, table, column, ddl):
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def m001_message_history_index(conn):
+    create_index(conn, "ix_message_project_timestamp_id", "message", ["project_id", "timestamp", "id"])
+
+
+def m002_unique_project_members(conn):
+    # Duplicate memberships would block the unique index
+    conn.execute(text(
+        "DELETE FROM project_member WHERE id NOT IN "
+        "(SELECT MIN(id) FROM project_member GROUP BY project_id, user_id)"
+    ))
+    create_index(conn, "uq_project_member_project_user", "project_member", ["project_id", "user_id"], unique=True)
+
+
+def m003_foreign_key_indexes(conn):
+    create_index(conn, "ix_project_owner_id", "project", ["owner_id"])
+    create_index(conn, "ix_project_member_user_project", "project_member", ["user_id", "project_id"])
+    create_index(conn, "ix_note_project_user", "note", ["project_id", "user_id"])
+    create_index(conn, "ix_message_sender_id", "message", ["sender_id"])
+    create_index(conn, "ix_task_project_assignee_pending", "task", ["project_id", "assigned_to", "submitted", "due_date"])
+    create_index(conn, "ix_task_assigned_to", "task", ["assigned_to"])
+    create_index(conn, "ix_task_submitted_by", "task", ["submitted_by"])
+
+
+def m004_note_blobs(conn):
+    # The blob table itself is new, so create_all() has already made it
+    add_column(conn, "note", "blob_sha256", "VARCHAR(64) REFERENCES blob (sha256)")
+
+
+# Migrations 5 and 6 spell out their SQL instead of calling search.py, so what an applied
+# version did never changes when the search code does.
+# (table, indexed column, rowid code) as of migration 5
+M005_SEARCH_SOURCES = [("message", "text", 0), ("task", "title", 1), ("note", "filename", 2)]
+
+
+def m005_full_text_search(conn):
+    if conn.dialect.name == "postgresql":
+        for table, column, _ in M005_SEARCH_SOURCES:
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('simple', coalesce({column}, ''))) STORED"
+            ))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)"))
+        return
+
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "body, kind UNINDEXED, ref_id UNINDEXED, project_id UNINDEXED, "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    for table, column, code in M005_SEARCH_SOURCES:
+        insert = (f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id) "
+                  f"VALUES (new.id * 4 + {code}, new.{column}, '{table}', new.id, new.project_id);")
+        delete = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {code};"
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert} END"))
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete} END"))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {column}, project_id ON {table} "
+            f"BEGIN {delete} {insert} END"
+        ))
+        conn.execute(text(
+            f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id) "
+            f"SELECT id * 4 + {code}, {column}, '{table}', id, project_id FROM {table}"
+        ))
+
+
+# A note's index body from migration 6 on: its filename plus its blob's extracted text
+M006_NOTE_BODY = "{r}.filename || coalesce(' ' || (SELECT text FROM blob WHERE sha256 = {r}.blob_sha256), '')"
+
+
+def m006_note_processing(conn):
+    # Existing blobs default to 'pending', so the note processor works through them after the upgrade
+    add_column(conn, "blob", "status", "VARCHAR(10) NOT NULL DEFAULT 'pending'")
+    add_column(conn, "blob", "attempts", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "blob", "claimed_at", "TIMESTAMP")
+    add_column(conn, "blob", "error", "VARCHAR(500)")
+    add_column(conn, "blob", "page_count", "INTEGER")
+    add_column(conn, "blob", "thumbnail_sha256", "VARCHAR(64)")
+    add_column(conn, "blob", "text", "TEXT")
+    create_index(conn, "ix_blob_status_created", "blob", ["status", "created_at"])
+    if conn.dialect.name == "postgresql":
+        # Extracted note text, searched through the notes that point at the blob
+        conn.execute(text(
+            "ALTER TABLE blob ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED"
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_blob_search_vector ON blob USING gin (search_vector)"))
+        return
+
+    # Note rows now also index their blob's text; replace the note triggers from migration 5
+    insert = (f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id) "
+              f"VALUES (new.id * 4 + 2, {M006_NOTE_BODY.format(r='new')}, 'note', new.id, new.project_id);")
+    delete = "DELETE FROM search_index WHERE rowid = old.id * 4 + 2;"
+    for trigger in ("note_search_ai", "note_search_au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.execute(text(f"CREATE TRIGGER note_search_ai AFTER INSERT ON note BEGIN {insert} END"))
+    conn.execute(text(
+        f"CREATE TRIGGER note_search_au AFTER UPDATE OF filename, blob_sha256, project_id ON note "
+        f"BEGIN {delete} {insert} END"
+    ))
+    # Extracted text lands on the blob after its notes exist; re-index every note of that blob
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS blob_search_au AFTER UPDATE OF text ON blob BEGIN "
+        f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id) "
+        f"SELECT id * 4 + 2, {M006_NOTE_BODY.format(r='note')}, 'note', id, project_id "
+        f"FROM note WHERE blob_sha256 = new.sha256; END"
+    ))
+    conn.execute(text(
+        f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id) "
+        f"SELECT id * 4 + 2, {M006_NOTE_BODY.format(r='note')}, 'note', id, project_id FROM note"
+    ))
+
+
+def m007_task_versions(conn):
+    # Existing tasks start at version 0, so they are only in full task lists, never in deltas
+    add_column(conn, "project", "task_version", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "task", "version", "INTEGER NOT NULL DEFAULT 0")
+    create_index(conn, "ix_task_project_version", "task", ["project_id", "version"])
+
+
+def m008_upload_finalize_claim(conn):
+    add_column(conn, "upload_session", "finalizing_at", "TIMESTAMP")
+
+
+# (table, index body for a row `r`, columns that change it, rowid code) as of migration 9
+M009_SEARCH_SOURCES = [
+    ("message", "{r}.text", "text", 0),
+    ("task", "{r}.title", "title", 1),
+    ("note", M006_NOTE_BODY, "filename, blob_sha256", 2),
+]
+
+
+def m009_scoped_search_index(conn):
+    # PostgreSQL scopes its search in the query; its columns and indexes stay as they are
+    if conn.dialect.name == "postgresql":
+        return
+
+    # Rebuilt with a `scope` column holding 'p<project_id>', so a search matches only the
+    # user's projects inside FTS5 and bm25 ranks nothing else
+    for table in ("message", "task", "note"):
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}"))
+    conn.execute(text("DROP TRIGGER IF EXISTS blob_search_au"))
+    conn.execute(text("DROP TABLE IF EXISTS search_index"))
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "body, kind UNINDEXED, ref_id UNINDEXED, project_id UNINDEXED, scope, "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    for table, body, columns, code in M009_SEARCH_SOURCES:
+        insert = (f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id, scope) "
+                  f"VALUES (new.id * 4 + {code}, {body.format(r='new')}, '{table}', new.id, new.project_id, "
+                  f"'p' || new.project_id);")
+        delete = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {code};"
+        conn.execute(text(f"CREATE TRIGGER {table}_search_ai AFTER INSERT ON {table} BEGIN {insert} END"))
+        conn.execute(text(f"CREATE TRIGGER {table}_search_ad AFTER DELETE ON {table} BEGIN {delete} END"))
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_search_au AFTER UPDATE OF {columns}, project_id ON {table} "
+            f"BEGIN {delete} {insert} END"
+        ))
+        conn.execute(text(
+            f"INSERT INTO search_index(rowid, body, kind, ref_id, project_id, scope) "
+            f"SELECT id * 4 + {code}, {body.format(r=table)}, '{table}', id, project_id, 'p' || project_id "
+            f"FROM {table}"
+        ))
+    conn.execute(text(
+        f"CREATE TRIGGER blob_search_au AFTER UPDATE OF text ON blob BEGIN "
+        f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id, scope) "
+        f"SELECT id * 4 + 2, {M006_NOTE_BODY.format(r='note')}, 'note', id, project_id, 'p' || project_id "
+        f"FROM note WHERE blob_sha256 = new.sha256; END"
+    ))
+
+
+def m010_username_prefix_index(conn):
+    # Invite typeahead ranges over username COLLATE "C" on PostgreSQL; the unique index uses the
+    # database's collation and can't serve that range. SQLite's unique index already compares bytes.
+    if conn.dialect.name == "postgresql":
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_username_c ON "user" (username COLLATE "C")'))
+
+
+def m011_drop_message_sender_index(conn):
+    # Added by migration 3, but no query reads messages by sender, and message takes the most writes
+    conn.execute(text("DROP INDEX IF EXISTS ix_message_sender_id"))
+
+
+MIGRATIONS = [
+    (1, "message_history_index", m001_message_history_index),
+    (2, "unique_project_members", m002_unique_project_members),
+    (3, "foreign_key_indexes", m003_foreign_key_indexes),
+    (4, "note_blobs", m004_note_blobs),
+    (5, "full_text_search", m005_full_text_search),
+    (6, "note_processing", m006_note_processing),
+    (7, "task_versions", m007_task_versions),
+    (8, "upload_finalize_claim", m008_upload_finalize_claim),
+    (9, "scoped_search_index", m009_scoped_search_index),
+    (10, "username_prefix_index", m010_username_prefix_index),
+    (11, "drop_message_sender_index", m011_drop_message_sender_index),
+]
+
+
+def run_migrations(engine):
+    """Apply every migration not yet recorded, each in its own transaction. Returns the versions applied."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations "
+            "(version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    done = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+        done.append(version)
+    return done
+
+
+# --- EXPLAIN QUERY PLAN regression checks ---
+# For checking a deployed database's indexes by hand. tests/test_query_plans.py explains the SQL
+# the routes really send; keep these in step with it.
+# (description, SQL shaped like the query app.py sends, index the plan must use)
+QUERY_PLAN_CHECKS = [
+    ("dashboard pending tasks",
+     "SELECT * FROM task WHERE project_id IN (1, 2, 3) AND submitted = 0 AND assigned_to = 1 ORDER BY due_date",
+     "ix_task_project_assignee_pending"),
+    ("tasks assigned to a user",
+     "SELECT * FROM task WHERE assigned_to = 1",
+     "ix_task_assigned_to"),
+    ("tasks submitted by a user",
+     "SELECT * FROM task WHERE submitted_by = 1",
+     "ix_task_submitted_by"),
+    ("membership check",
+     "SELECT * FROM project_member WHERE project_id = 1 AND user_id = 1",
+     "uq_project_member_project_user"),
+    ("projects of a user",
+     "SELECT project_id FROM project_member WHERE user_id = 1",
+     "ix_project_member_user_project"),
+    ("chat history page",
+     "SELECT * FROM message WHERE project_id = 1 AND (timestamp, id) < ('2024-01-01', 10) "
+     "ORDER BY timestamp DESC, id DESC LIMIT 50",
+     "ix_message_project_timestamp_id"),
+    ("project notes",
+     "SELECT * FROM note WHERE project_id = 1 AND user_id = 1",
+     "ix_note_project_user"),
+    ("projects by owner",
+     "SELECT * FROM project WHERE owner_id = 1",
+     "ix_project_owner_id"),
+    ("tasks changed since a version",
+     "SELECT * FROM task WHERE project_id = 1 AND version > 5 ORDER BY version, id",
+     "ix_task_project_version"),
+    # The unique constraint's index; its name is SQLite's for the first autoindex on user
+    ("invite typeahead",
+     "SELECT id, username FROM user WHERE username >= 'ab' AND username < 'ac' ORDER BY username LIMIT 10",
+     "sqlite_autoindex_user_1"),
+    ("note processing queue",
+     "SELECT sha256 FROM blob WHERE status = 'pending' ORDER BY created_at LIMIT 8",
+     "ix_blob_status_created"),
+    ("archived chat history",
+     "SELECT * FROM message_archive WHERE project_id = 1 ORDER BY last_ts DESC, last_id DESC",
+     "ix_message_archive_project_last"),
+]
+
+
+def check_query_plans(engine):
+    """Run EXPLAIN QUERY PLAN for each check; return a list of (description, plan) that missed their index."""
+    failures = []
+    with engine.connect() as conn:
+        for description, sql, index in QUERY_PLAN_CHECKS:
+            plan = " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+            if index not in plan:
+                failures.append((description, plan))
+    return failures
+
+
+if __name__ == "__main__":
+    from app import app, db, create_tables
+
+    create_tables()
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        with app.app_context():
+            failures = check_query_plans(db.engine)
+        for description, plan in failures:
+            print(f"❌ {description}: {plan}")
+        if failures:
+            sys.exit(1)
+        print(f"✅ {len(QUERY_PLAN_CHECKS)} query plans use their index")
+    else:
+        print("✅ Database schema is up to date")
@@ -32,22 +32,90 @@ class Project(db.Model):
     name = db.Column(db.String(100), nullable=False)
     owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     is_team = db.Column(db.Boolean, default=False)
+    # Bumped by every task change in the project; clients sync with "tasks changed since version V"
+    task_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     notes = db.relationship("Note", backref="project", lazy=True)
     messages = db.relationship("Message", backref="project", lazy=True)
     tasks = db.relationship("Task", backref="project", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_project_owner_id", "owner_id"),
+    )
+
 class ProjectMember(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
+    user = db.relationship("User", lazy=True)
+
+    # One row per (project, user); bulk membership inserts rely on this to skip existing members.
+    # The (user_id, project_id) index serves "which projects is this user in".
+    __table_args__ = (
+        db.Index("uq_project_member_project_user", "project_id", "user_id", unique=True),
+        db.Index("ix_project_member_user_project", "user_id", "project_id"),
+    )
+
+class Blob(db.Model):
+    # Uploaded file content, stored once per SHA-256 (see storage.BlobStore)
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Background processing (see note_processing.NoteProcessor): pending -> running -> done | failed.
+    # Kept per blob, so a file uploaded to many projects is processed once.
+    status = db.Column(db.String(10), nullable=False, default="pending", server_default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.String(500), nullable=True)
+    # Derived data, null until processing finds it
+    page_count = db.Column(db.Integer, nullable=True)
+    thumbnail_sha256 = db.Column(db.String(64), nullable=True)
+    # Extracted PDF text; indexed for search, never needed when listing notes
+    text = db.deferred(db.Column(db.Text, nullable=True))
+
+    __table_args__ = (
+        db.Index("ix_blob_status_created", "status", "created_at"),
+    )
+
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(200), nullable=False)
+    filename = db.Column(db.String(200), nullable=False) # Original filename, as uploaded
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    # Null for notes uploaded before content-addressed storage (served from UPLOAD_FOLDER by filename)
+    blob_sha256 = db.Column(db.String(64), db.ForeignKey("blob.sha256"), nullable=True)
+
+    blob = db.relationship("Blob", lazy=True)
+
+    __table_args__ = (
+        db.Index("ix_note_project_user", "project_id", "user_id"),
+    )
+
+class UploadSession(db.Model):
+    # A resumable chunked upload in progress; chunks live in storage.ChunkedUploads until finalize
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    filename = db.Column(db.String(200), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Set once finalized, so a retried finalize returns the same note
+    note_id = db.Column(db.Integer, db.ForeignKey("note.id"), nullable=True)
+    # Set by the one finalize request assembling the chunks (see claim_upload_finalize in app.py)
+    finalizing_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def chunk_length(self, index):
+        if index == self.chunk_count - 1:
+            return self.total_size - self.chunk_size * index
+        return self.chunk_size
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -56,6 +124,29 @@ class Message(db.Model):
     text = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Keyset pagination of a project's history walks this index newest-first
+    __table_args__ = (
+        db.Index("ix_message_project_timestamp_id", "project_id", "timestamp", "id"),
+    )
+
+class MessageArchive(db.Model):
+    # A run of a project's oldest messages moved out of `message` (see message_archive.py).
+    # Segments of a project never overlap and are all older than its remaining messages.
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    first_ts = db.Column(db.DateTime, nullable=False)
+    first_id = db.Column(db.Integer, nullable=False)
+    last_ts = db.Column(db.DateTime, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    # zlib-compressed NDJSON, one message per line, oldest first
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    # History reads walk a project's segments newest-first
+    __table_args__ = (
+        db.Index("ix_message_archive_project_last", "project_id", "last_ts", "last_id"),
+    )
+
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -66,4 +157,14 @@ class Task(db.Model):
     due_date = db.Column(db.Date, nullable=True)
     submitted = db.Column(db.Boolean, default=False)
     submitted_at = db.Column(db.DateTime, nullable=True)
-    submitted_by = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
\ No newline at end of file
+    submitted_by = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    # Project.task_version at this task's last change
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # The dashboard's pending-tasks query filters on all four columns and sorts by due_date
+    __table_args__ = (
+        db.Index("ix_task_project_assignee_pending", "project_id", "assigned_to", "submitted", "due_date"),
+        db.Index("ix_task_project_version", "project_id", "version"),
+        db.Index("ix_task_assigned_to", "assigned_to"),
+        db.Index("ix_task_submitted_by", "submitted_by"),
+    )
\ No newline at end of file
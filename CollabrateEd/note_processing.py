@@ -0,0 +1,206 @@
+import io
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, update
+from models import db, Blob
+
+# PDF support is optional: PyMuPDF gives page count, text and a thumbnail;
+# pypdf alone gives page count and text. Without either, only the size is known.
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+
+def extract(path, max_text_chars, thumbnail_width):
+    """Derived data for the file at `path`; runs in a worker process.
+
+    Returns a dict with page_count, text and thumbnail (PNG bytes), each None
+    when the file is not a PDF or no installed library can produce it.
+    """
+    result = {"page_count": None, "text": None, "thumbnail": None}
+    with open(path, "rb") as f:
+        if f.read(5) != b"%PDF-":
+            return result
+
+    if fitz is not None:
+        with fitz.open(path) as doc:
+            result["page_count"] = doc.page_count
+            result["text"] = _join_pages((page.get_text() for page in doc), max_text_chars)
+            if doc.page_count:
+                first = doc[0]
+                zoom = thumbnail_width / first.rect.width
+                result["thumbnail"] = first.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+    elif PdfReader is not None:
+        reader = PdfReader(path)
+        result["page_count"] = len(reader.pages)
+        result["text"] = _join_pages((page.extract_text() for page in reader.pages), max_text_chars)
+    return result
+
+
+def _join_pages(pages, max_chars):
+    # Stop reading pages once the limit is reached; huge PDFs only index their beginning
+    parts, total = [], 0
+    for page_text in pages:
+        if total >= max_chars:
+            break
+        page_text = page_text or ""
+        parts.append(page_text)
+        total += len(page_text) + 1
+    return "\n".join(parts)[:max_chars].strip() or None
+
+
+class NoteProcessor:
+    """Background processing of uploaded notes.
+
+    Work is tracked on Blob rows (status pending -> running -> done | failed),
+    so it survives restarts: a new blob starts as pending, and a blob left
+    running by a process that died is taken again once its claim is older than
+    `stale_after` seconds. Claims are a conditional UPDATE, so several app
+    processes can share the queue without processing a blob twice.
+
+    A background task claims up to `workers` blobs at a time and hands them to
+    a bounded process pool, so PDF parsing never runs on a request or socket
+    thread and never uses more than `workers` CPUs. `wake()` (called after an
+    upload commits) starts it and skips the poll wait.
+
+    A job that outlives `job_timeout` seconds, or whose worker process dies,
+    counts as a failed attempt; the pool is then replaced (stuck workers are
+    killed), so one bad file never stops the queue.
+    """
+
+    def __init__(self, app, socketio, blob_store, workers=2, poll_interval=30, stale_after=600,
+                 max_attempts=3, max_text_chars=200000, thumbnail_width=240, job_timeout=120):
+        self.app = app
+        self.socketio = socketio
+        self.blob_store = blob_store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.max_text_chars = max_text_chars
+        self.thumbnail_width = thumbnail_width
+        self.job_timeout = job_timeout
+        self._pool = None
+        self._wake = threading.Event()
+        self._task = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the background task if processing is enabled (workers > 0); picks up any unfinished blobs."""
+        with self._start_lock:
+            if self._task is None and self.workers > 0:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                processed = self.process_batch()
+            except Exception:
+                self.app.logger.exception("Note processing batch failed")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def process_batch(self):
+        """Claim and process up to `workers` blobs; returns how many were claimed."""
+        with self.app.app_context():
+            digests = self._claim(self.workers)
+            if not digests:
+                return 0
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [
+                (digest, self._pool.submit(extract, self.blob_store.path(digest), self.max_text_chars,
+                                           self.thumbnail_width))
+                for digest in digests
+            ]
+            # At most `workers` jobs are claimed, so all of them start at once and share one deadline
+            deadline = time.monotonic() + self.job_timeout
+            replace_pool = False
+            for digest, future in futures:
+                try:
+                    result = future.result(timeout=max(0, deadline - time.monotonic()))
+                except (BrokenProcessPool, TimeoutError) as exc:
+                    # A worker died or hangs; the pool can't be trusted with the next batch
+                    replace_pool = True
+                    if isinstance(exc, TimeoutError):
+                        exc = TimeoutError(f"Processing took longer than {self.job_timeout}s")
+                    self.app.logger.error("Processing blob %s failed: %r", digest, exc)
+                    self._fail(digest, exc)
+                    continue
+                except Exception as exc:
+                    self.app.logger.exception("Processing blob %s failed", digest)
+                    self._fail(digest, exc)
+                    continue
+                try:
+                    self._store(digest, result)
+                except Exception as exc:
+                    db.session.rollback()
+                    self.app.logger.exception("Storing results for blob %s failed", digest)
+                    self._fail(digest, exc)
+            if replace_pool:
+                self._discard_pool()
+            return len(digests)
+
+    def _discard_pool(self):
+        """Drop the pool without waiting for its jobs, killing workers still stuck in one."""
+        pool, self._pool = self._pool, None
+        # ProcessPoolExecutor has no public way to stop a running job before Python 3.14
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def _claim(self, limit):
+        now = datetime.utcnow()
+        claimable = or_(
+            Blob.status == "pending",
+            and_(Blob.status == "running", Blob.claimed_at < now - timedelta(seconds=self.stale_after)),
+        )
+        candidates = db.session.execute(
+            db.select(Blob.sha256).where(claimable).order_by(Blob.created_at).limit(limit)
+        ).scalars().all()
+        claimed = []
+        for digest in candidates:
+            # Another process may have claimed it since the SELECT; the WHERE makes the claim atomic
+            result = db.session.execute(
+                update(Blob).where(Blob.sha256 == digest, claimable)
+                .values(status="running", claimed_at=now, attempts=Blob.attempts + 1)
+            )
+            if result.rowcount:
+                claimed.append(digest)
+        db.session.commit()
+        return claimed
+
+    def _store(self, digest, result):
+        values = {"status": "done", "error": None, "page_count": result["page_count"], "text": result["text"]}
+        if result["thumbnail"]:
+            thumb_digest, thumb_size = self.blob_store.save_stream(io.BytesIO(result["thumbnail"]))
+            if db.session.get(Blob, thumb_digest) is None:
+                # A thumbnail is derived data itself; there is nothing to process in it
+                db.session.add(Blob(sha256=thumb_digest, size=thumb_size, status="done"))
+            values["thumbnail_sha256"] = thumb_digest
+        db.session.execute(update(Blob).where(Blob.sha256 == digest).values(**values))
+        db.session.commit()
+
+    def _fail(self, digest, exc):
+        blob = db.session.get(Blob, digest)
+        if blob is None:
+            return
+        # Retry on a later batch until max_attempts; then leave it failed so it stops costing work
+        blob.status = "failed" if blob.attempts >= self.max_attempts else "pending"
+        blob.error = f"{type(exc).__name__}: {exc}"[:500]
+        db.session.commit()
@@ -0,0 +1,324 @@
+"""Streaming NDJSON export and import of a project's members, tasks, notes and chat.
+
+An export is one JSON object per line: a "project" header, then "member",
+"task", "note" and "message" records (archived messages included, oldest
+first). Users are referred to by username, so an export can be imported on
+another installation. Notes carry their blob's SHA-256 but not the file
+itself; the import keeps the notes whose blob is already in this
+installation's store.
+
+Both directions run in constant memory: rows are read with yield_per
+(a server-side cursor on PostgreSQL) and written back with batched inserts.
+
+    python project_export.py export 12 project-12.ndjson.gz
+    python project_export.py import project-12.ndjson.gz --owner alice
+"""
+import argparse
+import gzip
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+from sqlalchemy import delete, select
+from sqlalchemy.orm import aliased
+import search
+from message_archive import archived_messages
+from models import db, User, Project, ProjectMember, Task, Note, Message, Blob
+from batch_insert import BATCH_SIZE, insert_batches
+
+FORMAT_VERSION = 1
+STREAM_ROWS = 1000
+MAX_LINE_CHARS = 1024 * 1024
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_records(session, project_id):
+    """Yield the export of a project as dicts, streaming each table."""
+    project = session.get(Project, project_id)
+    yield {"type": "project", "format": FORMAT_VERSION, "name": project.name, "is_team": bool(project.is_team),
+           "owner": project.owner.username, "exported_at": datetime.utcnow().isoformat()}
+
+    def stream(query):
+        return session.execute(query.execution_options(yield_per=STREAM_ROWS))
+
+    for (username,) in stream(
+        select(User.username).join(ProjectMember, ProjectMember.user_id == User.id)
+        .where(ProjectMember.project_id == project_id).order_by(ProjectMember.id)
+    ):
+        yield {"type": "member", "username": username}
+
+    assignee, submitter = aliased(User), aliased(User)
+    for task, assignee_name, submitter_name in stream(
+        select(Task, assignee.username, submitter.username)
+        .outerjoin(assignee, assignee.id == Task.assigned_to).outerjoin(submitter, submitter.id == Task.submitted_by)
+        .where(Task.project_id == project_id).order_by(Task.id)
+    ):
+        yield {"type": "task", "title": task.title, "assignee": assignee_name, "due_date": _iso(task.due_date),
+               "submitted": bool(task.submitted), "submitted_at": _iso(task.submitted_at),
+               "submitted_by": submitter_name}
+
+    for filename, sha256, size, author in stream(
+        select(Note.filename, Note.blob_sha256, Blob.size, User.username)
+        .join(User, User.id == Note.user_id).outerjoin(Blob, Blob.sha256 == Note.blob_sha256)
+        .where(Note.project_id == project_id).order_by(Note.id)
+    ):
+        yield {"type": "note", "filename": filename, "author": author, "sha256": sha256, "size": size}
+
+    # Archived messages are all older than the ones still in the table
+    usernames = {}
+    for message in archived_messages(session, project_id):
+        if message.sender_id not in usernames:
+            usernames[message.sender_id] = session.execute(
+                select(User.username).where(User.id == message.sender_id)).scalar()
+        yield {"type": "message", "sender": usernames[message.sender_id], "text": message.text,
+               "timestamp": message.timestamp.isoformat()}
+    for text, timestamp, sender in stream(
+        select(Message.text, Message.timestamp, User.username).join(User, User.id == Message.sender_id)
+        .where(Message.project_id == project_id).order_by(Message.timestamp, Message.id)
+    ):
+        yield {"type": "message", "sender": sender, "text": text, "timestamp": _iso(timestamp)}
+
+
+def ndjson(records, compress=True, chunk_size=64 * 1024):
+    """Encode records as NDJSON (gzip-compressed by default), yielding chunks of about `chunk_size` bytes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31: gzip container
+    buffer = []
+    size = 0
+    for record in records:
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            data = b"".join(buffer)
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = b"".join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+class _CappedReader(io.RawIOBase):
+    """Binary stream that raises ValueError once more than `max_bytes` have been read from it."""
+
+    def __init__(self, stream, max_bytes):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        self.bytes_read += len(data)
+        if self.bytes_read > self.max_bytes:
+            raise ValueError(f"Export is larger than {self.max_bytes} bytes uncompressed")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_export(stream, max_bytes=None, max_line_chars=MAX_LINE_CHARS):
+    """Text lines of an export read from a binary stream, gzip-compressed or not.
+
+    Raises ValueError as soon as more than `max_bytes` have been decompressed
+    or a line runs past `max_line_chars`, so neither a gzip bomb nor one
+    endless line is ever held in memory.
+    """
+    stream = io.BufferedReader(stream) if not hasattr(stream, "peek") else stream
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream)
+    if max_bytes is not None:
+        stream = io.BufferedReader(_CappedReader(stream, max_bytes))
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    while True:
+        line = text.readline(max_line_chars + 1)
+        if not line:
+            return
+        if len(line) > max_line_chars and not line.endswith("\n"):
+            raise ValueError(f"Export line longer than {max_line_chars} characters")
+        yield line
+
+
+def _string(record, field, required=True):
+    """record[field] if it is a string (or None, when not `required`); ValueError otherwise."""
+    value = record.get(field)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{record.get('type')} record has no valid {field}")
+    return value
+
+
+def _when(record, field, parse, required=False):
+    """record[field] parsed with date/datetime.fromisoformat, or None when absent and not `required`."""
+    value = _string(record, field, required)
+    return parse(value) if value else None
+
+
+def import_project(session, lines, owner_id, attribute_to_owner=False):
+    """Create a new project owned by `owner_id` from export `lines`; returns (project, counts).
+
+    Members, assignees and senders are matched to existing users by username;
+    messages from unknown users and notes whose blob is not stored here are
+    skipped (and counted). With `attribute_to_owner`, every username in the
+    export stands for the owner instead: nobody else becomes a member and
+    every message, note and task is theirs (the web import, where the
+    uploader can't vouch for other users). A malformed record raises
+    ValueError.
+
+    Rows are written with batched inserts, committing each batch, so the
+    import never holds the SQLite write lock for long (chat inserts waiting
+    behind it would time out). The members go in with the last commit, and
+    nobody can see a project they are not a member of, so the project only
+    appears once it is complete. If the import fails, whatever it had
+    committed is deleted again.
+    """
+    lines = iter(lines)
+    header = json.loads(next(lines, "null") or "null")
+    if not isinstance(header, dict) or header.get("type") != "project":
+        raise ValueError("Not a project export")
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format {header.get('format')!r}")
+
+    project = Project(name=_string(header, "name"), owner_id=owner_id, is_team=bool(header.get("is_team")))
+    session.add(project)
+    session.commit()
+    project_id = project.id
+    try:
+        counts = _import_rows(session, lines, project_id, owner_id, attribute_to_owner)
+    except BaseException:
+        session.rollback()
+        _discard_import(session, project_id)
+        raise
+    return project, counts
+
+
+def _discard_import(session, project_id):
+    """Delete the rows a failed import had already committed."""
+    for model in (Message, Note, Task, ProjectMember):
+        session.execute(delete(model).where(model.project_id == project_id))
+    session.execute(delete(Project).where(Project.id == project_id))
+    session.commit()
+
+
+def _import_rows(session, lines, project_id, owner_id, attribute_to_owner):
+    """Insert the records after the header into project `project_id`, one committed batch at a time."""
+    user_ids = {}
+
+    def user_id(record, field):
+        username = _string(record, field, required=False)
+        if username is None:
+            return None
+        if attribute_to_owner:
+            return owner_id
+        if username not in user_ids:
+            user_ids[username] = session.execute(select(User.id).where(User.username == username)).scalar()
+        return user_ids[username]
+
+    member_ids = {owner_id}
+    counts = {"member": 0, "task": 0, "note": 0, "message": 0, "skipped": 0}
+    batches = {"task": [], "note": [], "message": []}
+    tables = {"task": Task.__table__, "note": Note.__table__, "message": Message.__table__}
+
+    def flush(kind):
+        if not batches[kind]:
+            return
+        # The index trigger is swapped out for this batch's transaction only
+        with search.bulk_insert(session.connection(), [kind]):
+            counts[kind] += insert_batches(session, tables[kind], batches[kind])
+        session.commit()
+        batches[kind] = []
+
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Export record is not an object")
+        kind = record.get("type")
+        if kind == "member":
+            uid = user_id(record, "username")
+            if uid is not None:
+                member_ids.add(uid)
+            else:
+                counts["skipped"] += 1
+            continue
+        if kind == "task":
+            batches["task"].append({
+                "project_id": project_id, "title": _string(record, "title"),
+                "assigned_to": user_id(record, "assignee"),
+                "due_date": _when(record, "due_date", date.fromisoformat),
+                "submitted": bool(record.get("submitted")),
+                "submitted_at": _when(record, "submitted_at", datetime.fromisoformat),
+                "submitted_by": user_id(record, "submitted_by"),
+            })
+        elif kind == "note":
+            sha256 = _string(record, "sha256", required=False)
+            if not sha256 or session.get(Blob, sha256) is None:
+                counts["skipped"] += 1
+                continue
+            batches["note"].append({"project_id": project_id, "filename": _string(record, "filename"),
+                                    "user_id": user_id(record, "author") or owner_id, "blob_sha256": sha256})
+        elif kind == "message":
+            sender_id = user_id(record, "sender")
+            if sender_id is None:
+                counts["skipped"] += 1
+                continue
+            batches["message"].append({"project_id": project_id, "sender_id": sender_id,
+                                       "text": _string(record, "text"),
+                                       "timestamp": _when(record, "timestamp", datetime.fromisoformat, True)})
+        else:
+            raise ValueError(f"Unknown record type {kind!r}")
+        if len(batches[kind]) >= BATCH_SIZE:
+            flush(kind)
+    for kind in batches:
+        flush(kind)
+
+    counts["member"] = insert_batches(session, ProjectMember.__table__, (
+        {"project_id": project_id, "user_id": uid} for uid in sorted(member_ids)
+    ))
+    session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a project as NDJSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export")
+    export_cmd.add_argument("project_id", type=int)
+    export_cmd.add_argument("path", help='output file; ".gz" compresses; "-" for stdout')
+    import_cmd = sub.add_parser("import")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--owner", required=True, help="username that will own the new project")
+    args = parser.parse_args()
+
+    from app import app, create_tables
+
+    create_tables()
+    with app.app_context():
+        if args.command == "export":
+            if db.session.get(Project, args.project_id) is None:
+                sys.exit(f"No project {args.project_id}")
+            out = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+            with out:
+                for chunk in ndjson(export_records(db.session, args.project_id), compress=args.path.endswith(".gz")):
+                    out.write(chunk)
+        else:
+            owner = User.query.filter_by(username=args.owner).first()
+            if owner is None:
+                sys.exit(f"No user {args.owner}")
+            with open(args.path, "rb") as f:
+                project, counts = import_project(db.session, open_export(f), owner.id)
+            print(json.dumps({"project_id": project.id, **counts}))
+
+
+if __name__ == "__main__":
+    main()
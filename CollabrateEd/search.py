@@ -0,0 +1,146 @@
+"""Full-text search over chat messages, task titles, note filenames and PDF text.
+
+The index is maintained by the database itself, so every writer keeps it
+current (socket handlers, routes, the group-commit chat writer, bulk inserts):
+
+- SQLite: an FTS5 table `search_index` kept in sync by triggers on message,
+  task and note. Each row's rowid is `<id> * 4 + <kind code>`, so a trigger
+  can replace or delete the row for a changed source row directly. A note's
+  row holds its filename followed by the text extracted from its blob, and a
+  trigger on blob refreshes every note of a blob once its text is extracted.
+  The `scope` column holds `p<project_id>`, so a search matches only the
+  user's projects within FTS5 itself.
+- PostgreSQL: a generated `search_vector` tsvector column with a GIN index on
+  each of the three tables and on blob (for the extracted text).
+
+Both are created (and back-filled) by migrations 5, 6 and 9 in migrations.py.
+"""
+import re
+from contextlib import contextmanager
+from sqlalchemy import text
+
+# kind -> (table, indexed column, rowid code)
+SOURCES = {
+    "message": ("message", "text", 0),
+    "task": ("task", "title", 1),
+    "note": ("note", "filename", 2),
+}
+
+# SQLite index body for a note row `r`: the filename plus its blob's extracted text, if any
+NOTE_BODY = "{r}.filename || coalesce(' ' || (SELECT text FROM blob WHERE sha256 = {r}.blob_sha256), '')"
+
+
+def _body(kind, row):
+    return NOTE_BODY.format(r=row) if kind == "note" else f"{row}.{SOURCES[kind][1]}"
+
+
+def _insert_trigger(kind):
+    table, _, code = SOURCES[kind]
+    return (f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id, scope) "
+            f"VALUES (new.id * 4 + {code}, {_body(kind, 'new')}, '{kind}', new.id, new.project_id, "
+            f"'p' || new.project_id); END")
+
+
+def _backfill(conn, kind, after_id=0):
+    table, _, code = SOURCES[kind]
+    conn.execute(text(
+        f"INSERT OR REPLACE INTO search_index(rowid, body, kind, ref_id, project_id, scope) "
+        f"SELECT id * 4 + {code}, {_body(kind, table)}, '{kind}', id, project_id, 'p' || project_id "
+        f"FROM {table} WHERE id > :after"
+    ), {"after": after_id})
+
+
+@contextmanager
+def bulk_insert(conn, kinds):
+    """Bulk-load rows of `kinds` without running the SQLite index trigger once per row.
+
+    The insert triggers are dropped for the duration and the rows added
+    meanwhile are indexed with one INSERT ... SELECT at the end (several times
+    faster for large loads). Use inside a single transaction, so no other
+    connection ever sees a table without its trigger. No-op on PostgreSQL,
+    whose generated columns cost nothing extra per row.
+    """
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    last_ids = {}
+    for kind in kinds:
+        table = SOURCES[kind][0]
+        last_ids[kind] = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_search_ai"))
+    yield
+    for kind, after_id in last_ids.items():
+        conn.execute(text(_insert_trigger(kind)))
+        _backfill(conn, kind, after_id)
+
+
+def fts_query(query):
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(session, user_id, query, project_id=None, limit=20, offset=0):
+    """Ranked matches visible to `user_id` (projects they are a member of).
+
+    Returns a list of dicts with kind, ref_id, project_id and snippet, best
+    match first; fetch `limit + 1` to learn whether another page exists.
+    Only rows of the user's projects are ranked, not every match.
+    """
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    if session.get_bind().dialect.name == "postgresql":
+        params["q"] = query
+        # Each branch filters by membership before ranking; headlines are built for the returned page only
+        scope = "{t}.project_id IN (SELECT project_id FROM project_member WHERE user_id = :user_id)"
+        if project_id is not None:
+            scope += " AND {t}.project_id = :project_id"
+            params["project_id"] = project_id
+        parts = [
+            f"SELECT '{kind}' AS kind, id AS ref_id, project_id, {column} AS body, "
+            f"ts_rank(search_vector, websearch_to_tsquery('simple', :q)) AS rank FROM {table} "
+            f"WHERE search_vector @@ websearch_to_tsquery('simple', :q) AND {scope.format(t=table)}"
+            for kind, (table, column, _) in SOURCES.items() if kind != "note"
+        ]
+        # One row per note whether the filename, the extracted text or both match
+        parts.append(
+            "SELECT 'note' AS kind, note.id AS ref_id, note.project_id, "
+            "note.filename || coalesce(' ' || blob.text, '') AS body, "
+            "ts_rank(note.search_vector, websearch_to_tsquery('simple', :q)) "
+            "+ coalesce(ts_rank(blob.search_vector, websearch_to_tsquery('simple', :q)), 0) AS rank "
+            "FROM note LEFT JOIN blob ON blob.sha256 = note.blob_sha256 "
+            "WHERE (note.search_vector @@ websearch_to_tsquery('simple', :q) "
+            "OR blob.search_vector @@ websearch_to_tsquery('simple', :q)) "
+            f"AND {scope.format(t='note')}"
+        )
+        sql = (f"SELECT kind, ref_id, project_id, "
+               f"ts_headline('simple', body, websearch_to_tsquery('simple', :q)) AS snippet "
+               f"FROM ({' UNION ALL '.join(parts)} ORDER BY rank DESC LIMIT :limit OFFSET :offset) AS hits "
+               f"ORDER BY rank DESC")
+    else:
+        terms = fts_query(query)
+        project_ids = session.execute(
+            text("SELECT project_id FROM project_member WHERE user_id = :user_id"), params
+        ).scalars().all()
+        if project_id is not None:
+            project_ids = [project_id] if project_id in project_ids else []
+        if terms is None or not project_ids:
+            return []
+        # The scope column holds 'p<project_id>'; matching it inside FTS5 keeps other projects'
+        # rows out of the ranking. Its bm25 weight is 0, so it only filters.
+        scopes = " OR ".join(f"p{pid}" for pid in project_ids)
+        params["q"] = f"body : ({terms}) AND scope : ({scopes})"
+        # bm25() is lower for better matches
+        sql = ("SELECT kind, ref_id, project_id, snippet(search_index, 0, '', '', '…', 12) AS snippet "
+               "FROM search_index WHERE search_index MATCH :q "
+               "ORDER BY bm25(search_index, 1.0, 0.0, 0.0, 0.0, 0.0) LIMIT :limit OFFSET :offset")
+
+    return [
+        {"kind": row.kind, "ref_id": row.ref_id, "project_id": row.project_id, "snippet": row.snippet}
+        for row in session.execute(text(sql), params)
+    ]
@@ -0,0 +1,136 @@
+"""Reproducible bulk data for trying CollabrateEd at realistic sizes.
+
+    python seed_data.py --users 10000 --projects 2000 --members 8 --tasks 20 --messages 500
+    python seed_data.py --database-url sqlite:///instance/benchmark.db --users 100
+
+Rows are written with multi-row Core inserts in batches, not one ORM object
+at a time, so a million messages load in seconds. The same --seed always
+produces the same data. Seeded users are called seed_<n> with password
+"seed"; seeding again adds another set of users and projects after them.
+Prints one JSON line with row counts and timings.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from batch_insert import insert_batches
+
+TASK_WORDS = ["Draft", "Review", "Present", "Research", "Summarize", "Outline", "Test", "Submit"]
+TOPICS = ["thermodynamics", "linear algebra", "the lab report", "chapter 4", "the survey results",
+          "project proposal", "database schema", "literature review", "final slides", "the prototype"]
+PHRASES = ["Has anyone started on", "I pushed my notes for", "Can we meet about", "Quick question on",
+           "Finished my part of", "Who is taking", "Reminder: deadline for", "I found a good source on"]
+
+
+def max_id(db, model):
+    return db.session.execute(db.select(db.func.max(model.id))).scalar() or 0
+
+
+def seed(db, users=1000, projects=200, members=8, tasks=20, messages=200, seed=42):
+    """Insert `users` users and `projects` team projects, each with `members`
+    members (its owner included), `tasks` tasks and `messages` chat messages.
+    Call inside an app context. Returns {table: rows inserted}."""
+    import search
+    from models import User, Project, ProjectMember, Task, Message
+
+    rng = random.Random(seed)
+    counts = {}
+    members = max(1, min(members, users))
+
+    # Usernames must be unique across runs, so continue numbering after the last user
+    first_user = max_id(db, User) + 1
+    counts["user"] = insert_batches(db.session, User.__table__, (
+        {"username": f"seed_{first_user + i}", "password": "seed"} for i in range(users)
+    ))
+    user_ids = db.session.execute(
+        db.select(User.id).where(User.id >= first_user).order_by(User.id)
+    ).scalars().all()
+
+    first_project = max_id(db, Project) + 1
+    owners = [rng.choice(user_ids) for _ in range(projects)]
+    counts["project"] = insert_batches(db.session, Project.__table__, (
+        {"name": f"Seed project {first_project + i}", "owner_id": owner, "is_team": True}
+        for i, owner in enumerate(owners)
+    ))
+    project_ids = db.session.execute(
+        db.select(Project.id).where(Project.id >= first_project).order_by(Project.id)
+    ).scalars().all()
+
+    project_members = {}
+    for project_id, owner in zip(project_ids, owners):
+        others = rng.sample(user_ids, members)
+        project_members[project_id] = [owner] + [u for u in others if u != owner][:members - 1]
+    counts["project_member"] = insert_batches(db.session, ProjectMember.__table__, (
+        {"project_id": project_id, "user_id": user_id}
+        for project_id, member_ids in project_members.items() for user_id in member_ids
+    ))
+
+    today = date.today()
+
+    def task_rows():
+        for project_id, member_ids in project_members.items():
+            for i in range(tasks):
+                assignee = rng.choice(member_ids)
+                submitted = rng.random() < 0.3
+                yield {
+                    "title": f"Task {i + 1}: {rng.choice(TASK_WORDS)} {rng.choice(TOPICS)}",
+                    "project_id": project_id,
+                    "assigned_to": assignee,
+                    "due_date": today + timedelta(days=rng.randint(-14, 30)),
+                    "submitted": submitted,
+                    "submitted_at": datetime.utcnow() if submitted else None,
+                    "submitted_by": assignee if submitted else None,
+                }
+
+    start = datetime.utcnow() - timedelta(days=30)
+
+    def message_rows():
+        # Each project's messages are spread over the last 30 days in order, like a real chat log
+        step = timedelta(days=30) / max(messages, 1)
+        for project_id, member_ids in project_members.items():
+            for i in range(messages):
+                yield {
+                    "sender_id": rng.choice(member_ids),
+                    "project_id": project_id,
+                    "text": f"{rng.choice(PHRASES)} {rng.choice(TOPICS)}",
+                    "timestamp": start + step * i,
+                }
+
+    # Tasks and messages are indexed for search in one pass after loading, not by a trigger per row
+    with search.bulk_insert(db.session.connection(), ["task", "message"]):
+        counts["task"] = insert_batches(db.session, Task.__table__, task_rows())
+        counts["message"] = insert_batches(db.session, Message.__table__, message_rows())
+
+    db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-insert reproducible CollabrateEd data")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--members", type=int, default=8, help="members per project, owner included")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks per project")
+    parser.add_argument("--messages", type=int, default=200, help="chat messages per project")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL or instance/database.db")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    # Imported here so --database-url takes effect
+    from app import app, db, create_tables
+
+    create_tables()
+    started = time.perf_counter()
+    with app.app_context():
+        counts = seed(db, args.users, args.projects, args.members, args.tasks, args.messages, args.seed)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(json.dumps({"rows": counts, "seconds": round(elapsed, 2), "rows_per_sec": round(total / elapsed)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import queue
+import threading
+from socketio import PubSubManager
+
+
+class LocalPubSubManager(PubSubManager):
+    """In-process stand-in for a Socket.IO message queue.
+
+    Every manager on the same channel in this process sees every published
+    message, exactly as servers sharing a Redis/RabbitMQ channel would. Use it
+    to exercise the multi-worker code path with several servers in one process
+    and no broker; it does not reach other processes. (Flask-SocketIO's test
+    client refuses any message queue, so pair it with real Socket.IO clients.)
+    """
+    name = "local"
+
+    _channels = {}
+    _channels_lock = threading.Lock()
+
+    def __init__(self, channel="socketio", write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with self._channels_lock:
+                self._channels.setdefault(channel, []).append(self._inbox)
+
+    def _publish(self, data):
+        # Serialize like a real broker so nothing relies on sharing objects between "workers"
+        message = self.json.dumps(data)
+        with self._channels_lock:
+            inboxes = list(self._channels.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(message)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+def socketio_options(app):
+    """Keyword arguments for SocketIO() from SOCKETIO_MESSAGE_QUEUE and SOCKETIO_ASYNC_MODE.
+
+    SOCKETIO_MESSAGE_QUEUE: unset for a single process; a broker URL
+    (redis://, rediss://, amqp://, kafka://, zmq+tcp://) to share emits between
+    worker processes; or local:// for the in-process stand-in.
+    SOCKETIO_ASYNC_MODE: eventlet, gevent or threading; unset picks the first
+    one installed, in that order.
+    """
+    app.config["SOCKETIO_MESSAGE_QUEUE"] = os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+    app.config["SOCKETIO_CHANNEL"] = os.environ.get("SOCKETIO_CHANNEL", "collabrateed")
+    app.config["SOCKETIO_ASYNC_MODE"] = os.environ.get("SOCKETIO_ASYNC_MODE")
+
+    options = {}
+    if app.config["SOCKETIO_ASYNC_MODE"]:
+        options["async_mode"] = app.config["SOCKETIO_ASYNC_MODE"]
+    url = app.config["SOCKETIO_MESSAGE_QUEUE"]
+    if url == "local://":
+        options["client_manager"] = LocalPubSubManager(channel=app.config["SOCKETIO_CHANNEL"])
+    elif url:
+        options["message_queue"] = url
+        options["channel"] = app.config["SOCKETIO_CHANNEL"]
+    return options
@@ -0,0 +1,89 @@
+// Resumable chunked uploads for large notes.
+// Forms with data-chunked-url send files larger than data-chunk-threshold as
+// fixed-size chunks (init -> PUT each missing chunk -> finalize). The upload id
+// is kept in localStorage, so re-submitting the same file after a dropped
+// connection or a page reload only sends the chunks the server is missing.
+(function () {
+  const MAX_ATTEMPTS = 5;
+
+  function storageKey(url, file) {
+    return `chunked-upload:${url}:${file.name}:${file.size}:${file.lastModified}`;
+  }
+
+  async function putChunk(uploadId, index, blob) {
+    for (let attempt = 1; ; attempt++) {
+      try {
+        const response = await fetch(`/uploads/sessions/${uploadId}/chunks/${index}`, { method: 'PUT', body: blob });
+        if (response.ok) return;
+        if (response.status < 500 || attempt >= MAX_ATTEMPTS) throw new Error(`Chunk ${index} failed (${response.status})`);
+      } catch (err) {
+        if (attempt >= MAX_ATTEMPTS) throw err;
+      }
+      // Back off before retrying: 0.5s, 1s, 2s, ...
+      await new Promise(resolve => setTimeout(resolve, 500 * 2 ** (attempt - 1)));
+    }
+  }
+
+  async function startOrResume(url, file) {
+    const key = storageKey(url, file);
+    const previous = localStorage.getItem(key);
+    if (previous) {
+      const response = await fetch(`/uploads/sessions/${previous}`);
+      if (response.ok) return [key, await response.json()];
+      localStorage.removeItem(key);
+    }
+    const response = await fetch(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    if (!response.ok) throw new Error((await response.json()).error);
+    const status = await response.json();
+    localStorage.setItem(key, status.upload_id);
+    return [key, status];
+  }
+
+  async function finalize(uploadId) {
+    for (let attempt = 1; ; attempt++) {
+      const response = await fetch(`/uploads/sessions/${uploadId}/finalize`, { method: 'POST' });
+      // 202: an earlier request for this upload is still assembling it; ask again shortly
+      if (response.status !== 202) {
+        if (!response.ok) throw new Error('Could not finish the upload');
+        return;
+      }
+      if (attempt >= MAX_ATTEMPTS * 6) throw new Error('Could not finish the upload');
+      await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+  }
+
+  async function uploadInChunks(form, file, progress) {
+    const [key, status] = await startOrResume(form.dataset.chunkedUrl, file);
+    let done = status.chunk_count - status.missing.length;
+    for (const index of status.missing) {
+      const start = index * status.chunk_size;
+      await putChunk(status.upload_id, index, file.slice(start, start + status.chunk_size));
+      done++;
+      progress.textContent = `Uploading… ${Math.round(100 * done / status.chunk_count)}%`;
+    }
+    progress.textContent = 'Finishing upload…';
+    await finalize(status.upload_id);
+    localStorage.removeItem(key);
+  }
+
+  document.querySelectorAll('form[data-chunked-url]').forEach(form => {
+    form.addEventListener('submit', event => {
+      const file = form.querySelector('input[type="file"]').files[0];
+      if (!file || file.size <= parseInt(form.dataset.chunkThreshold)) return; // small files use the plain POST
+      event.preventDefault();
+      let progress = form.querySelector('.chunked-upload-progress');
+      if (!progress) {
+        progress = document.createElement('small');
+        progress.className = 'chunked-upload-progress d-block text-muted mt-1';
+        form.appendChild(progress);
+      }
+      uploadInChunks(form, file, progress)
+        .then(() => window.location.reload())
+        .catch(err => { progress.textContent = `Upload interrupted: ${err.message}. Submit again to resume.`; });
+    });
+  });
+})();
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+def file_digest(path, chunk_size=64 * 1024):
+    """SHA-256 of a file on disk, cached until its size or mtime changes."""
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_size, stat.st_mtime_ns, chunk_size)
+
+
+@lru_cache(maxsize=1024)
+def _file_digest(path, size, mtime_ns, chunk_size):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class BlobStore:
+    """Content-addressed file store for uploaded notes.
+
+    Files are streamed to a temp file in fixed-size chunks while their SHA-256
+    is computed, then moved to `<root>/<aa>/<bb>/<sha256>`. A file that is
+    already stored is not written twice, so the same PDF uploaded by many
+    students takes the space of one, and two different files can never
+    overwrite each other just because they share a name.
+    """
+
+    def __init__(self, root, chunk_size=64 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def save_stream(self, stream, max_size=None):
+        """Store everything read from `stream`; returns (sha256 hex digest, size in bytes).
+
+        Raises RequestEntityTooLarge (HTTP 413) as soon as more than `max_size`
+        bytes have been read; the partial temp file is removed.
+        """
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise RequestEntityTooLarge(f"Uploads are limited to {max_size} bytes")
+                    sha.update(chunk)
+                    out.write(chunk)
+            digest = sha.hexdigest()
+            return digest, self.commit(tmp_path, digest, size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def commit(self, tmp_path, digest, size):
+        """Move a fully written temp file into place under its digest (or drop it if already stored)."""
+        final_path = self.path(digest)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return size
+
+
+class ChunkedUploads:
+    """Temp storage for resumable uploads: one directory per upload, one file per chunk.
+
+    Each chunk is written to a `.part` temp file of its own request and
+    renamed into place only when complete, so a dropped connection never
+    leaves a half chunk that looks received, and a re-sent chunk racing the
+    original never writes into the same file: whichever finishes last simply
+    replaces the other. Chunks may arrive in any order; `open_assembled()`
+    reads them back in index order.
+    """
+
+    def __init__(self, root, chunk_size=64 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        return os.path.join(self.root, upload_id)
+
+    def write_chunk(self, upload_id, index, stream, expected_size):
+        """Store chunk `index` from `stream`; returns False (and keeps nothing) if its size is wrong."""
+        directory = self._dir(upload_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, part_path = tempfile.mkstemp(dir=directory, prefix=f"{index}.", suffix=".part")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while size <= expected_size:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    out.write(chunk)
+            if size != expected_size:
+                os.remove(part_path)
+                return False
+            os.replace(part_path, os.path.join(directory, str(index)))
+            return True
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+    def received(self, upload_id):
+        directory = self._dir(upload_id)
+        if not os.path.isdir(directory):
+            return set()
+        return {int(name) for name in os.listdir(directory) if name.isdigit()}
+
+    def open_assembled(self, upload_id, chunk_count):
+        """File-like object that reads chunks 0..chunk_count-1 back to back."""
+        return _ChainedChunks([os.path.join(self._dir(upload_id), str(i)) for i in range(chunk_count)])
+
+    def discard(self, upload_id):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+
+class _ChainedChunks:
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._current = None
+
+    def read(self, size=-1):
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return b""
+                self._current = open(self._paths.pop(0), "rb")
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
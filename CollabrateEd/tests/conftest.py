@@ -0,0 +1,102 @@
+"""Shared fixtures: the app on a throwaway SQLite database, with uploads in a temp directory.
+
+Run from CollabrateEd/:  python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+_tmp = tempfile.mkdtemp(prefix="collabrateed-tests-")
+# Set before the app is imported: the engine, socket mode and note workers are fixed at import time
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "test.db").replace("\\", "/")
+os.environ["NOTE_WORKERS"] = "0"
+os.environ["SOCKETIO_ASYNC_MODE"] = "threading"
+os.environ.pop("SOCKETIO_MESSAGE_QUEUE", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+from models import db, User, Project, ProjectMember  # noqa: E402
+from storage import BlobStore, ChunkedUploads  # noqa: E402
+
+app_module.create_tables()
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch, tmp_path):
+    """Each test starts with empty tables, empty caches and its own upload folders."""
+    monkeypatch.setattr(app_module, "blob_store", BlobStore(str(tmp_path / "blobs")))
+    monkeypatch.setattr(app_module, "chunked_uploads", ChunkedUploads(str(tmp_path / "chunks")))
+    yield
+    with app_module.app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+    app_module.dashboard_cache.clear()
+    app_module.identity_cache.clear()
+
+
+@pytest.fixture
+def app():
+    return app_module.app
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username):
+        with app.app_context():
+            user = User(username=username, password="pw")
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def make_project(app):
+    def make(owner_id, member_ids=(), name="Project", is_team=True):
+        with app.app_context():
+            project = Project(name=name, owner_id=owner_id, is_team=is_team)
+            db.session.add(project)
+            db.session.flush()
+            for user_id in {owner_id, *member_ids}:
+                db.session.add(ProjectMember(project_id=project.id, user_id=user_id))
+            db.session.commit()
+            return project.id
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """HTTP test client logged in as `user_id` (None for an anonymous client)."""
+    def client_for(user_id):
+        client = app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as session:
+                session["user_id"] = user_id
+        return client
+    return client_for
+
+
+@pytest.fixture
+def capture_sql(app):
+    """Context manager collecting (statement, parameters) for every SQL statement run inside it."""
+    @contextmanager
+    def capture():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return capture
@@ -0,0 +1,26 @@
+import app as app_module
+from models import db, Task, User
+
+
+def test_commit_invalidates_and_rollback_does_not(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    login(alice).get("/dashboard")
+    with app.app_context():
+        assert app_module.identity_cache.get(alice).username == "alice"
+    assert app_module.dashboard_cache.get(alice) is not None
+
+    with app.app_context():
+        db.session.get(User, alice).username = "alicia"
+        db.session.add(Task(title="draft", project_id=project_id, assigned_to=alice))
+        db.session.flush()
+        db.session.rollback()
+    assert app_module.dashboard_cache.get(alice) is not None
+    with app.app_context():
+        assert app_module.identity_cache.get(alice).username == "alice"
+
+        db.session.get(User, alice).username = "alicia"
+        db.session.add(Task(title="draft", project_id=project_id, assigned_to=alice))
+        db.session.commit()
+        assert app_module.identity_cache.get(alice).username == "alicia"
+    assert app_module.dashboard_cache.get(alice) is None
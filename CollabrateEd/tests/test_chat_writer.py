@@ -0,0 +1,136 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+import app as app_module
+from chat_writer import MessageWriter
+from models import Message
+
+
+class RecordingSocketIO:
+    """Stands in for SocketIO: records emits; background tasks are counted, not run."""
+
+    def __init__(self, start_delay=0):
+        self.emits = []
+        self.tasks_started = 0
+        self.start_delay = start_delay
+
+    def emit(self, event, payload, to=None):
+        self.emits.append((event, dict(payload), to))
+
+    def start_background_task(self, target):
+        time.sleep(self.start_delay)
+        self.tasks_started += 1
+        return object()
+
+
+def row(sender_id, project_id, text):
+    return {"sender_id": sender_id, "project_id": project_id, "text": text, "timestamp": datetime.utcnow()}
+
+
+def test_bad_row_only_drops_itself(app, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    project_id = make_project(alice, [bob])
+    socketio = RecordingSocketIO()
+    writer = MessageWriter(app, socketio, app_module.project_room)
+
+    for i in range(5):
+        writer.submit(row(alice, project_id, f"m{i}"), {"text": f"m{i}"}, sid="alice-sid")
+    writer.submit(row(bob, project_id, None), {"text": None}, sid="bob-sid")
+    writer.flush()
+
+    with app.app_context():
+        assert [m.text for m in Message.query.order_by(Message.id)] == [f"m{i}" for i in range(5)]
+    errors = [(payload, to) for event, payload, to in socketio.emits if event == "message_error"]
+    assert errors == [({"error": "Message could not be saved", "text": None}, "bob-sid")]
+    delivered = [payload["text"] for event, payload, _ in socketio.emits if event == "new_message"]
+    assert delivered == [f"m{i}" for i in range(5)]
+
+
+def test_concurrent_first_submits_start_one_writer(app):
+    socketio = RecordingSocketIO(start_delay=0.05)
+    writer = MessageWriter(app, socketio, app_module.project_room)
+    threads = [threading.Thread(target=writer.submit, args=(row(1, 1, "x"), {})) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert socketio.tasks_started == 1
+
+
+def test_handler_rejects_invalid_text(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    client = app_module.socketio.test_client(app, flask_test_client=login(alice))
+
+    for text in (None, "", "   ", 42):
+        assert not client.emit("send_message", {"project_id": project_id, "text": text}, callback=True)
+    app_module.message_writer.flush()
+    with app.app_context():
+        assert Message.query.count() == 0
+
+
+class ThreadedSocketIO(RecordingSocketIO):
+    """Runs background tasks in real threads."""
+
+    def start_background_task(self, target):
+        self.tasks_started += 1
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def message_texts(app):
+    with app.app_context():
+        return [m.text for m in Message.query.order_by(Message.id)]
+
+
+def test_writer_survives_an_unexpected_error(app, make_user, make_project, monkeypatch):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    socketio = ThreadedSocketIO()
+    writer = MessageWriter(app, socketio, app_module.project_room)
+    insert = writer._insert
+
+    def fail_once(batch):
+        monkeypatch.setattr(writer, "_insert", insert)
+        raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+    monkeypatch.setattr(writer, "_insert", fail_once)
+
+    writer.submit(row(alice, project_id, "lost"), {"text": "lost"})
+    assert wait_for(lambda: writer._insert is insert)
+    writer.submit(row(alice, project_id, "saved"), {"text": "saved"})
+
+    assert wait_for(lambda: message_texts(app) == ["saved"])
+    assert socketio.tasks_started == 1
+
+
+def test_close_writes_what_is_still_queued(app, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    socketio = ThreadedSocketIO()
+    # The writer would hold these for 10 s before writing them
+    writer = MessageWriter(app, socketio, app_module.project_room, flush_interval_ms=10000)
+    for i in range(3):
+        writer.submit(row(alice, project_id, f"m{i}"), {"text": f"m{i}"})
+
+    started = time.monotonic()
+    writer.close()
+    assert time.monotonic() - started < 2
+    assert message_texts(app) == ["m0", "m1", "m2"]
+    assert writer._task is None
+
+    # A submit after close starts a new writer
+    writer.submit(row(alice, project_id, "later"), {"text": "later"})
+    assert socketio.tasks_started == 2
+    writer.close()
+    assert message_texts(app) == ["m0", "m1", "m2", "later"]
@@ -0,0 +1,173 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from models import db, Note
+from storage import ChunkedUploads
+
+CHUNK = 4
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(app, monkeypatch):
+    monkeypatch.setitem(app.config, "UPLOAD_CHUNK_BYTES", CHUNK)
+
+
+@pytest.fixture
+def uploader(login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    return login(alice), project_id
+
+
+def start_upload(client, project_id, data, filename="notes.pdf"):
+    response = client.post(f"/projects/{project_id}/uploads", json={"filename": filename, "size": len(data)})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def put_chunk(client, upload_id, index, body):
+    return client.put(f"/uploads/sessions/{upload_id}/chunks/{index}", data=body)
+
+
+class PausedStream:
+    """Request body that hands out `first`, then waits for `resume` before handing out `rest`."""
+
+    def __init__(self, first, rest):
+        self.parts = [first, rest]
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+
+    def read(self, size=-1):
+        if len(self.parts) == 1:
+            self.paused.set()
+            self.resume.wait(5)
+        return self.parts.pop(0) if self.parts else b""
+
+
+def note_count(app):
+    with app.app_context():
+        return db.session.query(Note).count()
+
+
+def test_chunks_in_any_order_assemble_in_index_order(app, uploader):
+    client, project_id = uploader
+    data = b"0123456789"
+    status = start_upload(client, project_id, data)
+    assert status["chunk_count"] == 3 and status["missing"] == [0, 1, 2]
+
+    for index in (2, 0, 1):
+        assert put_chunk(client, status["upload_id"], index, data[index * CHUNK:(index + 1) * CHUNK]).status_code == 200
+    response = client.post(f"/uploads/sessions/{status['upload_id']}/finalize")
+
+    assert response.status_code == 200
+    assert client.get(response.get_json()["url"]).data == data
+
+
+def test_interrupted_upload_resumes_with_missing_chunks(app, uploader):
+    client, project_id = uploader
+    data = b"0123456789"
+    upload_id = start_upload(client, project_id, data)["upload_id"]
+    assert put_chunk(client, upload_id, 0, data[:4]).status_code == 200
+    # A dropped connection delivers a short chunk; it is not kept
+    assert put_chunk(client, upload_id, 1, data[4:6]).status_code == 400
+
+    response = client.post(f"/uploads/sessions/{upload_id}/finalize")
+    assert response.status_code == 409 and response.get_json()["missing"] == [1, 2]
+    assert client.get(f"/uploads/sessions/{upload_id}").get_json()["missing"] == [1, 2]
+
+    assert put_chunk(client, upload_id, 1, data[4:8]).status_code == 200
+    assert put_chunk(client, upload_id, 2, data[8:]).status_code == 200
+    first = client.post(f"/uploads/sessions/{upload_id}/finalize")
+    retry = client.post(f"/uploads/sessions/{upload_id}/finalize")
+
+    assert first.status_code == retry.status_code == 200
+    assert first.get_json()["note_id"] == retry.get_json()["note_id"]
+    assert client.get(first.get_json()["url"]).data == data
+    assert put_chunk(client, upload_id, 0, data[:4]).status_code == 409
+    assert note_count(app) == 1
+
+
+def test_concurrent_finalize_creates_one_note(app, uploader, monkeypatch):
+    client, project_id = uploader
+    data = b"01234567"
+    upload_id = start_upload(client, project_id, data)["upload_id"]
+    for index in range(2):
+        put_chunk(client, upload_id, index, data[index * CHUNK:(index + 1) * CHUNK])
+
+    # Slow assembly, so the other finalize requests arrive while it runs
+    save_stream = app_module.blob_store.save_stream
+
+    def slow_save_stream(stream, max_size=None):
+        time.sleep(0.3)
+        return save_stream(stream, max_size)
+
+    monkeypatch.setattr(app_module.blob_store, "save_stream", slow_save_stream)
+    responses = []
+
+    def finalize():
+        response = client.post(f"/uploads/sessions/{upload_id}/finalize")
+        responses.append((response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=finalize) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    statuses = sorted(status for status, _ in responses)
+    assert statuses.count(200) >= 1 and set(statuses) <= {200, 202}
+    assert all(body["finalizing"] for status, body in responses if status == 202)
+    note_ids = {body["note_id"] for status, body in responses if status == 200}
+    after = client.post(f"/uploads/sessions/{upload_id}/finalize").get_json()["note_id"]
+    assert note_ids == {after}
+    assert note_count(app) == 1
+
+
+def test_failed_assembly_releases_the_claim(app, uploader, monkeypatch):
+    client, project_id = uploader
+    data = b"0123"
+    upload_id = start_upload(client, project_id, data)["upload_id"]
+    put_chunk(client, upload_id, 0, data)
+
+    def broken_save_stream(stream, max_size=None):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module.blob_store, "save_stream", broken_save_stream)
+        assert client.post(f"/uploads/sessions/{upload_id}/finalize").status_code == 500
+
+    assert client.post(f"/uploads/sessions/{upload_id}/finalize").status_code == 200
+    assert note_count(app) == 1
+
+
+@pytest.mark.parametrize("size", [True, -1, "10", None])
+def test_init_rejects_invalid_size(uploader, size):
+    client, project_id = uploader
+    response = client.post(f"/projects/{project_id}/uploads", json={"filename": "a.pdf", "size": size})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("original_rest, kept", [(b"cd", b"abcd"), (b"", b"WXYZ")])
+def test_retried_chunk_racing_the_original(tmp_path, original_rest, kept):
+    """A retry that lands while the original PUT of the same chunk is still writing never mixes with it:
+    whichever completes last is kept, and an original that then drops leaves the retry's chunk intact."""
+    uploads = ChunkedUploads(str(tmp_path))
+    original = PausedStream(b"ab", original_rest)
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(original=uploads.write_chunk("u", 0, original, 4)))
+    thread.start()
+    assert original.paused.wait(5)
+
+    results["retry"] = uploads.write_chunk("u", 0, io.BytesIO(b"WXYZ"), 4)
+    original.resume.set()
+    thread.join()
+
+    assert results == {"original": bool(original_rest), "retry": True}
+    assert uploads.received("u") == {0}
+    assert (tmp_path / "u" / "0").read_bytes() == kept
+    assert os.listdir(tmp_path / "u") == ["0"]
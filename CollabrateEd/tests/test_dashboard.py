@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from models import db, Message, Task
+
+
+def add_messages(app, project_id, sender_id, texts, start):
+    with app.app_context():
+        for i, text in enumerate(texts):
+            db.session.add(Message(project_id=project_id, sender_id=sender_id, text=text,
+                                   timestamp=start + timedelta(minutes=i)))
+        db.session.commit()
+
+
+def test_dashboard_query_count_on_miss_and_hit(app, login, make_user, make_project, capture_sql):
+    alice, bob = make_user("alice"), make_user("bob")
+    team = make_project(alice, [bob], name="Team")
+    make_project(alice, name="Personal", is_team=False)
+    make_project(bob, name="Joinable")
+    add_messages(app, team, bob, ["hello"], datetime.utcnow())
+    with app.app_context():
+        db.session.add(Task(title="Write", project_id=team, assigned_to=alice))
+        db.session.commit()
+    client = login(alice)
+    client.get("/settings")  # loads alice into the identity cache
+
+    with capture_sql() as miss:
+        response = client.get("/dashboard")
+    assert response.status_code == 200
+    assert b"hello" in response.data and b"Joinable" in response.data
+    assert len(miss) == 4
+
+    with capture_sql() as hit:
+        assert client.get("/dashboard").status_code == 200
+    assert hit == []
+
+    # A new message in one of her projects invalidates the entry
+    add_messages(app, team, bob, ["again"], datetime.utcnow())
+    with capture_sql() as after_change:
+        assert b"again" in client.get("/dashboard").data
+    assert len(after_change) == 4
+
+
+def test_dashboard_messages_are_newest_across_projects(app, login, make_user, make_project):
+    alice = make_user("alice")
+    busy, quiet, other = make_project(alice, name="Busy"), make_project(alice, name="Quiet"), make_project(alice)
+    start = datetime(2026, 1, 1)
+    add_messages(app, busy, alice, [f"busy {i}" for i in range(40)], start)
+    add_messages(app, quiet, alice, ["quiet 0", "quiet 1"], start + timedelta(minutes=35, seconds=30))
+    add_messages(app, other, alice, ["old"], start - timedelta(days=1))
+
+    from app import build_dashboard_data
+    with app.app_context():
+        texts = [m["text"] for m in build_dashboard_data(alice)["messages"]]
+
+    expected = sorted(
+        [(start + timedelta(minutes=i), f"busy {i}") for i in range(40)]
+        + [(start + timedelta(minutes=35 + i, seconds=30), f"quiet {i}") for i in range(2)],
+        reverse=True,
+    )[:20]
+    assert texts == [text for _, text in expected]
@@ -0,0 +1,66 @@
+import sys
+
+from app import prefix_upper_bound
+
+MAX = chr(sys.maxunicode)
+
+
+def candidates(client, project_id, prefix):
+    response = client.get(f"/team-projects/{project_id}/invite-candidates", query_string={"q": prefix})
+    return response.status_code, [user["username"] for user in (response.get_json() or {}).get("users", [])]
+
+
+def test_members_are_excluded(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    make_user("bobby")
+    project_id = make_project(alice, [bob])
+
+    assert candidates(login(alice), project_id, "bob") == (200, ["bobby"])
+    assert candidates(login(alice), project_id, "ali") == (200, [])
+
+
+def test_results_are_limited_and_ordered(app, login, make_user, make_project, monkeypatch):
+    monkeypatch.setitem(app.config, "INVITE_CANDIDATE_LIMIT", 3)
+    alice = make_user("alice")
+    for name in ("user4", "user1", "user3", "user2", "user0"):
+        make_user(name)
+    project_id = make_project(alice)
+
+    assert candidates(login(alice), project_id, "user") == (200, ["user0", "user1", "user2"])
+
+
+def test_wildcards_in_the_prefix_match_literally(app, login, make_user, make_project):
+    alice = make_user("alice")
+    for name in ("a%b", "a_b", "axb", "a%%"):
+        make_user(name)
+    project_id = make_project(alice)
+
+    assert candidates(login(alice), project_id, "a%") == (200, ["a%%", "a%b"])
+    assert candidates(login(alice), project_id, "a_") == (200, ["a_b"])
+
+
+def test_non_members_are_refused(app, login, make_user, make_project):
+    alice, mallory = make_user("alice"), make_user("mallory")
+    project_id = make_project(alice)
+
+    assert candidates(login(mallory), project_id, "a")[0] == 403
+    assert candidates(login(mallory), project_id + 1, "a")[0] in (403, 404)
+    assert candidates(login(None), project_id, "a")[0] == 401
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound("ab") == "ac"
+    assert prefix_upper_bound("a" + MAX) == "b"
+    assert prefix_upper_bound("a" + MAX + MAX) == "b"
+    assert prefix_upper_bound(MAX) is None
+    assert prefix_upper_bound("a\ud7ff") == "a\ue000"
+
+
+def test_prefix_ending_in_the_highest_code_point(app, login, make_user, make_project):
+    alice = make_user("alice")
+    for name in ("z" + MAX + "1", "z" + MAX, MAX + "x", "{"):
+        make_user(name)
+    project_id = make_project(alice)
+
+    assert candidates(login(alice), project_id, "z" + MAX) == (200, ["z" + MAX, "z" + MAX + "1"])
+    assert candidates(login(alice), project_id, MAX) == (200, [MAX + "x"])
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+import message_archive
+from message_archive import archive_messages, archived_messages
+from models import db, Message, MessageArchive
+
+START = datetime(2026, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def chat(app, make_user, make_project):
+    """A project with messages m0..m9, one a minute from START."""
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    with app.app_context():
+        for i in range(10):
+            db.session.add(Message(sender_id=alice, project_id=project_id, text=f"m{i}",
+                                   timestamp=START + timedelta(minutes=i)))
+        db.session.commit()
+    return alice, project_id
+
+
+def cutoff_after(minutes):
+    return START + timedelta(minutes=minutes, seconds=30)
+
+
+def test_old_messages_move_into_segments(app, chat):
+    _, project_id = chat
+    with app.app_context():
+        assert archive_messages(db.session, cutoff_after(6), segment_size=3) == 7
+
+        segments = MessageArchive.query.order_by(MessageArchive.first_ts).all()
+        assert [s.message_count for s in segments] == [3, 3, 1]
+        assert [m.text for m in Message.query.order_by(Message.timestamp)] == ["m7", "m8", "m9"]
+        assert [m.text for m in archived_messages(db.session, project_id)] == [f"m{i}" for i in range(7)]
+
+        # Nothing left to move
+        assert archive_messages(db.session, cutoff_after(6), segment_size=3) == 0
+
+
+def test_interrupted_archiving_resumes(app, chat, monkeypatch):
+    _, project_id = chat
+    pack = message_archive.pack
+    calls = []
+
+    def pack_then_crash(messages):
+        calls.append(len(messages))
+        if len(calls) == 2:
+            raise RuntimeError("killed")
+        return pack(messages)
+
+    with app.app_context():
+        monkeypatch.setattr(message_archive, "pack", pack_then_crash)
+        with pytest.raises(RuntimeError):
+            archive_messages(db.session, cutoff_after(6), segment_size=3)
+        db.session.rollback()
+        # The first segment was committed with its messages removed; nothing else changed
+        assert MessageArchive.query.count() == 1
+        assert Message.query.count() == 7
+
+        monkeypatch.setattr(message_archive, "pack", pack)
+        assert archive_messages(db.session, cutoff_after(6), segment_size=3) == 4
+        assert [m.text for m in archived_messages(db.session, project_id)] == [f"m{i}" for i in range(7)]
+        assert Message.query.count() == 3
+
+
+@pytest.mark.parametrize("limit", [2, 3, 4])
+def test_history_pages_across_the_archive_boundary(app, chat, limit):
+    _, project_id = chat
+    with app.app_context():
+        archive_messages(db.session, cutoff_after(5), segment_size=2)
+
+        seen = []
+        cursor = (None, None)
+        while True:
+            page = app_module.message_page(project_id, *cursor, limit=limit, include_archived=True)
+            assert len(page) <= limit
+            seen += [m.text for m in page]
+            next_cursor = app_module.next_message_cursor(page, limit)
+            if next_cursor is None:
+                break
+            cursor = (datetime.fromisoformat(next_cursor["before_ts"]), next_cursor["before_id"])
+
+    assert seen == [f"m{i}" for i in reversed(range(10))]
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Message
+
+
+@pytest.fixture
+def history(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    start = datetime(2026, 1, 1, 9, 0)
+    with app.app_context():
+        for i in range(5):
+            db.session.add(Message(sender_id=alice, project_id=project_id, text=f"m{i}",
+                                   timestamp=start + timedelta(minutes=i)))
+        db.session.commit()
+    return login(alice), f"/team-projects/{project_id}/messages"
+
+
+@pytest.mark.parametrize("archived", ["", "&include_archived=1"])
+@pytest.mark.parametrize("cursor", ["before_ts=2026-01-01T09:03:00", "before_id=4",
+                                    "before_ts=2026-01-01T09:03:00&before_id=x"])
+def test_half_a_cursor_is_rejected(history, cursor, archived):
+    client, url = history
+    response = client.get(f"{url}?{cursor}{archived}")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("archived", ["", "&include_archived=1"])
+def test_cursor_pages_through_history(history, archived):
+    client, url = history
+    first = client.get(f"{url}?limit=2{archived}").get_json()
+    assert [m["text"] for m in first["messages"]] == ["m4", "m3"]
+
+    cursor = first["next"]
+    second = client.get(f"{url}?limit=2&before_ts={cursor['before_ts']}&before_id={cursor['before_id']}{archived}")
+    assert [m["text"] for m in second.get_json()["messages"]] == ["m2", "m1"]
@@ -0,0 +1,80 @@
+import logging
+import re
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from metrics import Metrics
+
+SAMPLE = re.compile(r'^([a-z_]+)(\{(?:[a-z_]+="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+def parse(body):
+    """{name: [(labels text, value)]} of a Prometheus text body, checking every line's shape."""
+    samples = {}
+    for line in body.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# TYPE [a-z_]+ (counter|histogram)$", line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        samples.setdefault(match.group(1), []).append((match.group(2) or "", float(match.group(3))))
+    return samples
+
+
+def test_metrics_output_format(app, login, make_user):
+    alice = make_user("alice")
+    login(alice).get("/dashboard")
+
+    response = app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    samples = parse(response.get_data(as_text=True))
+
+    route = 'kind="http",name="/dashboard"'
+    assert any(route in labels and 'status="200"' in labels
+               for labels, _ in samples["collabrateed_requests_total"])
+    buckets = [(labels, value) for labels, value in samples["collabrateed_scope_seconds_bucket"] if route in labels]
+    assert buckets[-1][0].endswith('le="+Inf"}')
+    assert [value for _, value in buckets] == sorted(value for _, value in buckets)
+    count, = [value for labels, value in samples["collabrateed_scope_seconds_count"] if route in labels]
+    assert buckets[-1][1] == count
+
+
+def test_metrics_token(app, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    client = app.test_client()
+
+    missing = client.get("/metrics")
+    assert missing.status_code == 401
+    assert missing.headers["WWW-Authenticate"] == "Bearer"
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one(caplog):
+    metrics = Metrics(n_plus_one_threshold=3, logger=logging.getLogger("test_metrics"))
+    web = Flask(__name__)
+    engine = create_engine("sqlite://")
+    metrics.install(web, engine)
+
+    @web.route("/items/<int:count>")
+    def items(count):
+        with engine.connect() as conn:
+            for i in range(count):
+                conn.execute(text("SELECT :i"), {"i": i})
+        return "ok"
+
+    client = web.test_client()
+    with caplog.at_level(logging.WARNING, logger="test_metrics"):
+        client.get("/items/2")
+        assert "collabrateed_repeated_statements_total" not in metrics.render()
+        client.get("/items/3")
+        client.get("/items/5")
+
+    flagged = parse(metrics.render())["collabrateed_repeated_statements_total"]
+    assert flagged == [('{kind="http",name="/items/<int:count>"}', 2.0)]
+    # Logged the first time only
+    assert [r.getMessage() for r in caplog.records] == [
+        "Possible N+1 in http /items/<int:count>: statement ran 3 times: SELECT ?"
+    ]
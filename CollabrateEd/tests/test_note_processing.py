@@ -0,0 +1,69 @@
+import io
+import os
+import time
+
+import pytest
+
+import app as app_module
+import note_processing
+from models import db, Blob
+from note_processing import NoteProcessor
+
+
+def die(path, max_text_chars, thumbnail_width):
+    os._exit(1)
+
+
+def hang(path, max_text_chars, thumbnail_width):
+    time.sleep(60)
+
+
+@pytest.fixture
+def processor(app):
+    processor = NoteProcessor(app, app_module.socketio, app_module.blob_store, workers=1, job_timeout=1)
+    yield processor
+    if processor._pool is not None:
+        processor._discard_pool()
+
+
+def add_blob(app, data):
+    digest, size = app_module.blob_store.save_stream(io.BytesIO(data))
+    with app.app_context():
+        db.session.add(Blob(sha256=digest, size=size))
+        db.session.commit()
+    return digest
+
+
+def blob_state(app, digest):
+    with app.app_context():
+        blob = db.session.get(Blob, digest)
+        return blob.status, blob.attempts, blob.error
+
+
+@pytest.mark.parametrize("job, error", [(die, "BrokenProcessPool"), (hang, "TimeoutError")])
+def test_broken_or_stuck_worker_does_not_stop_the_queue(app, processor, monkeypatch, job, error):
+    bad = add_blob(app, b"bad file")
+    with monkeypatch.context() as patch:
+        patch.setattr(note_processing, "extract", job)
+        started = time.monotonic()
+        assert processor.process_batch() == 1
+        assert time.monotonic() - started < 10
+
+    status, attempts, message = blob_state(app, bad)
+    assert (status, attempts) == ("pending", 1) and message.startswith(error)
+
+    # A fresh pool takes the next batch: the retried blob and a new one both finish
+    good = add_blob(app, b"not a pdf")
+    assert processor.process_batch() == 1
+    assert processor.process_batch() == 1
+    assert blob_state(app, bad)[0] == blob_state(app, good)[0] == "done"
+
+
+def test_blob_failed_after_max_attempts(app, processor, monkeypatch):
+    digest = add_blob(app, b"bad file")
+    monkeypatch.setattr(note_processing, "extract", die)
+    for _ in range(processor.max_attempts):
+        processor.process_batch()
+
+    assert blob_state(app, digest)[:2] == ("failed", processor.max_attempts)
+    assert processor.process_batch() == 0
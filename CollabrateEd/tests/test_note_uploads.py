@@ -0,0 +1,52 @@
+import io
+import os
+
+import app as app_module
+from models import db, Blob, Note
+
+PDF = b"%PDF-1.4 the same lecture slides"
+
+
+def stored_files(root):
+    """Paths of every file under the blob store, temp files included."""
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(root) for f in files)
+
+
+def upload(client, project_id, data, filename="slides.pdf"):
+    return client.post(f"/team-projects/{project_id}/upload",
+                       data={"file": (io.BytesIO(data), filename)}, content_type="multipart/form-data")
+
+
+def test_identical_uploads_are_stored_once(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    first = make_project(alice, [bob])
+    second = make_project(bob)
+
+    assert upload(login(alice), first, PDF).status_code == 302
+    assert upload(login(bob), first, PDF, "copy.pdf").status_code == 302
+    assert upload(login(bob), second, PDF).status_code == 302
+
+    with app.app_context():
+        notes = Note.query.order_by(Note.id).all()
+        assert [n.filename for n in notes] == ["slides.pdf", "copy.pdf", "slides.pdf"]
+        assert len({n.blob_sha256 for n in notes}) == 1
+        assert [(b.sha256, b.size) for b in Blob.query.all()] == [(notes[0].blob_sha256, len(PDF))]
+    blob_store = app_module.blob_store
+    assert stored_files(blob_store.root) == [blob_store.path(notes[0].blob_sha256)]
+
+
+def test_upload_over_the_limit_is_413_and_leaves_nothing(app, login, make_user, make_project, monkeypatch):
+    monkeypatch.setitem(app.config, "UPLOAD_MAX_BYTES", 100)
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    # Several store chunks, so the limit is hit after a partial temp file has been written
+    monkeypatch.setattr(app_module.blob_store, "chunk_size", 16)
+
+    assert upload(login(alice), project_id, b"x" * 101).status_code == 413
+
+    assert stored_files(app_module.blob_store.root) == []
+    with app.app_context():
+        assert db.session.query(Note).count() == 0
+        assert db.session.query(Blob).count() == 0
+    # Exactly the limit is still accepted
+    assert upload(login(alice), project_id, b"x" * 100).status_code == 302
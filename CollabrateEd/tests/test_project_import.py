@@ -0,0 +1,128 @@
+import gzip
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import project_export
+from models import db, Message, Project, ProjectMember, Task
+
+
+HEADER = {"type": "project", "format": 1, "name": "Imported", "is_team": True}
+
+
+def export_file(*records):
+    lines = [json.dumps(record) for record in (HEADER, *records)]
+    return io.BytesIO(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def message(sender, text):
+    return {"type": "message", "sender": sender, "text": text, "timestamp": "2026-01-01T10:00:00"}
+
+
+def upload(client, data):
+    return client.post("/projects/import", data={"file": (data, "export.ndjson")},
+                       headers={"Accept": "application/json"})
+
+
+def test_web_import_attributes_everything_to_the_uploader(app, login, make_user):
+    bob, mallory = make_user("bob"), make_user("mallory")
+    response = upload(login(mallory), export_file(
+        {"type": "member", "username": "bob"},
+        {"type": "message", "sender": "bob", "text": "I resign", "timestamp": "2026-01-01T10:00:00"},
+        {"type": "task", "title": "Grade", "assignee": "bob", "submitted_by": "bob"},
+    ))
+    assert response.status_code == 200
+    project_id = response.get_json()["project_id"]
+
+    with app.app_context():
+        assert [m.user_id for m in ProjectMember.query.filter_by(project_id=project_id)] == [mallory]
+        assert [(m.sender_id, m.text) for m in Message.query.filter_by(project_id=project_id)] == [(mallory, "I resign")]
+        task = Task.query.filter_by(project_id=project_id).one()
+        assert task.assigned_to == task.submitted_by == mallory
+        assert bob not in {m.user_id for m in ProjectMember.query}
+
+
+@pytest.mark.parametrize("record", [
+    ["not", "an", "object"],
+    "text",
+    {"type": "task", "title": None},
+    {"type": "message", "sender": "alice", "text": None, "timestamp": "2026-01-01T10:00:00"},
+    {"type": "message", "sender": "alice", "text": "hi", "timestamp": 5},
+    {"type": "message", "sender": ["alice"], "text": "hi", "timestamp": "2026-01-01T10:00:00"},
+    {"type": "member", "username": {"name": "alice"}},
+    {"type": "note", "sha256": 7, "filename": "a.pdf"},
+])
+def test_malformed_record_is_rejected_without_a_project(app, login, make_user, record):
+    alice = make_user("alice")
+    response = upload(login(alice), export_file(record))
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.query(Project).count() == 0
+
+
+def test_cli_import_keeps_other_users(app, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    lines = project_export.open_export(export_file(
+        {"type": "member", "username": "bob"},
+        {"type": "message", "sender": "bob", "text": "hello", "timestamp": "2026-01-01T10:00:00"},
+    ))
+    with app.app_context():
+        project, counts = project_export.import_project(db.session, lines, alice)
+        db.session.commit()
+        assert sorted(m.user_id for m in ProjectMember.query.filter_by(project_id=project.id)) == [alice, bob]
+        assert [m.sender_id for m in Message.query.filter_by(project_id=project.id)] == [bob]
+
+
+def test_oversized_export_is_rejected(app, login, make_user, monkeypatch):
+    alice = make_user("alice")
+    client = login(alice)
+    monkeypatch.setitem(app.config, "IMPORT_MAX_BYTES", 1024 * 1024)
+    # A few KB of gzip that expands to 2 MB
+    bomb = gzip.compress(json.dumps(HEADER).encode() + b"\n" + b" " * (2 * 1024 * 1024))
+    assert len(bomb) < 10 * 1024
+    assert upload(client, io.BytesIO(bomb)).status_code == 400
+
+    long_line = json.dumps(HEADER).encode() + b"\n" + b'"' + b"x" * project_export.MAX_LINE_CHARS + b'"\n'
+    assert upload(client, io.BytesIO(long_line)).status_code == 400
+    with app.app_context():
+        assert db.session.query(Project).count() == 0
+
+
+def test_import_commits_batch_by_batch(app, make_user, monkeypatch):
+    """Other writers (the chat writer) get the database between batches, and the project only gets
+    its members, so becomes visible, once everything is in."""
+    alice = make_user("alice")
+    monkeypatch.setattr(project_export, "BATCH_SIZE", 2)
+    with app.app_context():
+        other_writer = create_engine(db.engine.url, connect_args={"timeout": 0})
+    observed = {}
+
+    def lines():
+        yield json.dumps(HEADER)
+        for i in range(3):
+            yield json.dumps(message("alice", f"m{i}"))
+        # The first batch of two is committed; a write from another connection must not wait for the import
+        with other_writer.begin() as conn:
+            conn.execute(text("UPDATE user SET password = 'changed' WHERE id = :id"), {"id": alice})
+            observed["members"] = conn.execute(text("SELECT count(*) FROM project_member")).scalar()
+        yield json.dumps(message("alice", "m3"))
+
+    with app.app_context():
+        project, counts = project_export.import_project(db.session, lines(), alice)
+        assert counts["message"] == 4 and counts["member"] == 1
+        assert Message.query.filter_by(project_id=project.id).count() == 4
+    assert observed == {"members": 0}
+    other_writer.dispose()
+
+
+def test_failed_import_removes_committed_batches(app, make_user, monkeypatch):
+    alice = make_user("alice")
+    monkeypatch.setattr(project_export, "BATCH_SIZE", 2)
+    lines = [json.dumps(HEADER)] + [json.dumps(message("alice", f"m{i}")) for i in range(5)] + ["[]"]
+    with app.app_context():
+        with pytest.raises(ValueError):
+            project_export.import_project(db.session, lines, alice)
+        assert db.session.query(Project).count() == 0
+        assert db.session.query(Message).count() == 0
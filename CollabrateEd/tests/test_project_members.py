@@ -0,0 +1,63 @@
+from sqlalchemy import select
+
+import app as app_module
+from models import db, ProjectMember, User
+
+
+def member_ids(app, project_id):
+    with app.app_context():
+        return sorted(db.session.execute(
+            select(ProjectMember.user_id).where(ProjectMember.project_id == project_id)
+        ).scalars())
+
+
+def invite(client, project_id, usernames):
+    return client.post(f"/projects/{project_id}/invite", data={"username": usernames})
+
+
+def test_duplicate_usernames_are_added_once(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    project_id = make_project(alice)
+
+    response = invite(login(alice), project_id, ["bob", " bob ", "bob"])
+    assert response.status_code == 302
+    assert member_ids(app, project_id) == [alice, bob]
+
+    with app.test_request_context():
+        assert app_module.add_project_members(project_id, [bob, bob]) == []
+
+
+def test_unknown_usernames_are_skipped(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    project_id = make_project(alice)
+
+    assert invite(login(alice), project_id, ["ghost", "bob", ""]).status_code == 302
+    assert member_ids(app, project_id) == [alice, bob]
+    with app.app_context():
+        assert db.session.query(User).count() == 2
+
+
+def test_reinviting_a_member_adds_nothing(app, login, make_user, make_project):
+    alice, bob, carol = make_user("alice"), make_user("bob"), make_user("carol")
+    project_id = make_project(alice, [bob])
+
+    with app.test_request_context():
+        assert app_module.add_project_members(project_id, [bob, carol]) == [carol]
+        db.session.commit()
+    assert invite(login(alice), project_id, ["bob", "carol"]).status_code == 302
+    assert member_ids(app, project_id) == sorted([alice, bob, carol])
+
+
+def test_invited_user_sees_the_project_on_their_cached_dashboard(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    project_id = make_project(alice, name="Chemistry")
+    client = login(bob)
+    client.get("/dashboard")
+    assert [p["id"] for p in app_module.dashboard_cache.get(bob)["joinable_projects"]] == [project_id]
+
+    invite(login(alice), project_id, ["bob"])
+
+    # The bulk insert invalidated bob's entry, so the next dashboard lists it as his
+    assert app_module.dashboard_cache.get(bob) is None
+    client.get("/dashboard")
+    assert [p["id"] for p in app_module.dashboard_cache.get(bob)["team_projects"]] == [project_id]
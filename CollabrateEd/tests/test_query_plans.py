@@ -0,0 +1,129 @@
+"""EXPLAIN QUERY PLAN regression tests on the SQL the routes actually send.
+
+Each test drives real requests, captures the statements the ORM compiled
+(with their parameters) and explains them against the test database. Without
+ANALYZE statistics SQLite plans as if every table were large, so a missing or
+unusable index shows up as a SCAN even on tiny test data.
+"""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect
+
+import app as app_module
+from models import db, Message, Task, Note, Blob
+
+# Tables that grow with use; a full scan of any of them is a regression
+GROWING_TABLES = ("message", "task", "project_member", "note", "blob", "message_archive", "user", "upload_session")
+
+
+def explain(app, statements):
+    """[(table, statement, plan)] for the captured SELECT/UPDATE/DELETE statements; `table` is the first one
+    the statement reads (its first FROM, or the UPDATE/DELETE target)."""
+    plans = []
+    with app.app_context():
+        conn = db.session.connection()
+        for statement, parameters in statements:
+            if statement.lstrip().split(None, 1)[0].upper() not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+                continue
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            table = re.search(r"\b(?:FROM|UPDATE)\s+(\w+)", statement).group(1)
+            plans.append((table, statement, " | ".join(row[-1] for row in rows)))
+        db.session.rollback()
+    return plans
+
+
+@pytest.fixture
+def populated(app, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    team = make_project(alice, [bob], name="Team")
+    make_project(bob, name="Other")
+    with app.app_context():
+        start = datetime(2026, 1, 1)
+        db.session.add_all([Message(project_id=team, sender_id=bob, text=f"m{i}", timestamp=start + timedelta(minutes=i))
+                            for i in range(5)])
+        db.session.add(Task(title="Write", project_id=team, assigned_to=alice))
+        db.session.add(Blob(sha256="a" * 64, size=1))
+        db.session.add(Note(project_id=team, user_id=alice, filename="n.pdf", blob_sha256="a" * 64))
+        db.session.commit()
+    return {"alice": alice, "bob": bob, "team": team}
+
+
+def full_scans(plan):
+    """Growing tables the plan reads in full (aliases like message_1 count as their table)."""
+    tables = (re.sub(r"_\d+$", "", name) for name in re.findall(r"\bSCAN (\w+)", plan))
+    return [table for table in tables if table in GROWING_TABLES]
+
+
+def assert_plans(plans, expected, index_ordered=()):
+    """Every statement reading a table in `expected` has that table's plan fragments (an index name, or a
+    tuple of them); statements reading an `index_ordered` table get their order from the index, without a
+    temp B-tree sort; and nothing scans a growing table."""
+    for table, fragments in expected.items():
+        matching = [(statement, plan) for read, statement, plan in plans if read == table]
+        assert matching, f"no statement reads {table}"
+        for statement, plan in matching:
+            for fragment in (fragments,) if isinstance(fragments, str) else fragments:
+                assert fragment in plan, f"{statement}\n-> {plan}"
+            if table in index_ordered:
+                assert "TEMP B-TREE" not in plan, f"{statement}\n-> {plan}"
+    for _, statement, plan in plans:
+        assert not full_scans(plan), f"{statement}\n-> {plan}"
+
+
+# The unique constraint's index on user.username; SQLite names it after the table
+USERNAME_INDEX = "sqlite_autoindex_user_1"
+
+# (url, {table: index or plan fragments}, tables whose rows must come out of the index already in order)
+ROUTE_PLANS = [
+    # Dashboard messages: the newest rows of each project off the history index, then a sort of only those
+    ("/dashboard", {"project": "ix_project_member_user_project",
+                    "task": "ix_task_project_assignee_pending",
+                    "message": ("CORRELATED LIST SUBQUERY", "ix_message_project_timestamp_id")}, ()),
+    ("/team-projects/{team}", {"project_member": "uq_project_member_project_user",
+                               "note": "ix_note_project_user",
+                               "message": "ix_message_project_timestamp_id",
+                               "message_archive": "ix_message_archive_project_last"}, ("message", "message_archive")),
+    ("/team-projects/{team}/messages?before_ts=2026-01-01T00:03:00&before_id=4",
+     {"message": "ix_message_project_timestamp_id"}, ("message",)),
+    ("/team-projects/{team}/tasks?since=0", {"task": "ix_task_project_version"}, ("task",)),
+    ("/team-projects/{team}/invite-candidates?q=b", {"user": USERNAME_INDEX}, ("user",)),
+    ("/team-projects", {"project_member": "ix_project_member_user_project"}, ()),
+    ("/profile", {"project_member": "ix_project_member_user_project"}, ()),
+    # Search: the user's projects off the membership index, then one FTS5 MATCH scoped to them
+    ("/search?q=m1", {"project_member": "ix_project_member_user_project",
+                      "search_index": "VIRTUAL TABLE INDEX 0:M"}, ()),
+]
+
+
+@pytest.mark.parametrize("url, expected, index_ordered", ROUTE_PLANS, ids=[url.split("?")[0] for url, *_ in ROUTE_PLANS])
+def test_route_queries_use_their_indexes(app, login, populated, capture_sql, url, expected, index_ordered):
+    client = login(populated["alice"])
+    client.get("/settings")  # identity cache warm-up, so only the route's own queries are captured
+    with capture_sql() as statements:
+        assert client.get(url.format(team=populated["team"])).status_code == 200
+    assert_plans(explain(app, statements), expected, index_ordered)
+
+
+def test_login_looks_up_username_by_index(app, populated, capture_sql):
+    with capture_sql() as statements:
+        app.test_client().post("/", data={"username": "alice", "password": "pw"})
+    assert_plans(explain(app, statements), {"user": USERNAME_INDEX})
+
+
+def test_note_queue_claim_uses_status_index(app, populated, capture_sql):
+    with capture_sql() as statements, app.app_context():
+        app_module.note_processor._claim(2)
+    plans = explain(app, statements)
+    # The claim UPDATEs then go by primary key, one blob at a time
+    selects = [plan for plan in plans if plan[1].startswith("SELECT")]
+    assert_plans(selects, {"blob": "ix_blob_status_created"})
+    assert_plans(plans, {})
+
+
+def test_message_has_only_the_indexes_its_reads_use(app):
+    # Every index on message is paid for by every chat insert
+    with app.app_context():
+        indexes = {index["name"] for index in inspect(db.engine).get_indexes("message")}
+    assert indexes == {"ix_message_project_timestamp_id"}
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import search
+from models import db, Blob, Message, Note
+
+
+def add_message(app, sender_id, project_id, text):
+    with app.app_context():
+        message = Message(sender_id=sender_id, project_id=project_id, text=text, timestamp=datetime.utcnow())
+        db.session.add(message)
+        db.session.commit()
+        return message.id
+
+
+def hits(app, user_id, query, project_id=None):
+    with app.app_context():
+        return [(h["kind"], h["ref_id"]) for h in search.search(db.session, user_id, query, project_id)]
+
+
+def test_only_the_users_projects_are_matched(app, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    shared = make_project(alice, [bob])
+    private = make_project(bob)
+    mine = add_message(app, alice, shared, "lab report draft")
+    # A better match in a project alice is not in must not be returned, or ranked ahead of hers
+    add_message(app, bob, private, "lab report lab report lab report")
+
+    assert hits(app, alice, "lab report") == [("message", mine)]
+    assert hits(app, alice, "lab", project_id=private) == []
+    assert len(hits(app, bob, "lab")) == 2
+
+
+def test_scope_tokens_are_not_searchable_as_text(app, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    add_message(app, alice, project_id, "hello")
+
+    assert hits(app, alice, f"p{project_id}") == []
+
+
+def test_index_follows_edits_moves_and_deletes(app, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    first = make_project(alice)
+    second = make_project(bob)
+    message_id = add_message(app, alice, first, "photosynthesis")
+
+    with app.app_context():
+        message = db.session.get(Message, message_id)
+        message.text = "mitochondria"
+        db.session.commit()
+    assert hits(app, alice, "photosynthesis") == []
+    assert hits(app, alice, "mito") == [("message", message_id)]
+
+    with app.app_context():
+        db.session.get(Message, message_id).project_id = second
+        db.session.commit()
+    assert hits(app, alice, "mito") == []
+    assert hits(app, bob, "mito") == [("message", message_id)]
+
+    with app.app_context():
+        db.session.delete(db.session.get(Message, message_id))
+        db.session.commit()
+    assert hits(app, bob, "mito") == []
+
+
+def test_note_is_found_by_its_extracted_text(app, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    with app.app_context():
+        db.session.add(Blob(sha256="ab" * 32, size=3))
+        note = Note(user_id=alice, project_id=project_id, filename="lecture.pdf", blob_sha256="ab" * 32)
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+        db.session.get(Blob, "ab" * 32).text = "entropy and enthalpy"
+        db.session.commit()
+
+    assert hits(app, alice, "enthalpy") == [("note", note_id)]
+    assert hits(app, alice, "lecture") == [("note", note_id)]
+
+
+def test_bulk_insert_indexes_rows_with_their_scope(app, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    with app.app_context():
+        with search.bulk_insert(db.session.connection(), ["message"]):
+            db.session.execute(Message.__table__.insert(), [
+                {"sender_id": alice, "project_id": project_id, "text": f"seeded {i}", "timestamp": datetime.utcnow()}
+                for i in range(3)
+            ])
+        db.session.commit()
+    later = add_message(app, alice, project_id, "seeded later")
+
+    assert len(hits(app, alice, "seeded")) == 4
+    assert ("message", later) in hits(app, alice, "seeded", project_id=project_id)
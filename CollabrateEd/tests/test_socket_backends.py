@@ -0,0 +1,75 @@
+import threading
+import uuid
+
+import pytest
+import socketio as socketio_client
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+from werkzeug.serving import make_server
+
+from socket_backends import LocalPubSubManager, socketio_options
+
+
+@pytest.fixture
+def local_queue(monkeypatch):
+    # A channel of its own, so servers of other tests never share it
+    monkeypatch.setenv("SOCKETIO_MESSAGE_QUEUE", "local://")
+    monkeypatch.setenv("SOCKETIO_CHANNEL", f"test-{uuid.uuid4().hex}")
+    monkeypatch.setenv("SOCKETIO_ASYNC_MODE", "threading")
+
+
+@pytest.fixture
+def start_server(local_queue):
+    """Start an app with its own SocketIO server on a free port; returns (socketio, url)."""
+    servers = []
+
+    def start():
+        app = Flask(__name__)
+        socketio = SocketIO(app, **socketio_options(app))
+
+        @socketio.on("join")
+        def join(room):
+            join_room(room)
+            return True
+
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return socketio, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_emit_on_one_server_reaches_a_client_of_another(start_server):
+    first, _ = start_server()
+    second, second_url = start_server()
+    assert isinstance(first.server.manager, LocalPubSubManager)
+
+    received = threading.Event()
+    payloads = []
+    client = socketio_client.Client()
+
+    @client.on("new_message")
+    def on_message(data):
+        payloads.append(data)
+        received.set()
+
+    client.connect(second_url, transports=["polling"], wait_timeout=5)
+    try:
+        assert client.call("join", "project_1", timeout=5)
+        # Emitted by the first server, which has no client at all; only the shared channel connects them
+        first.emit("new_message", {"text": "hi"}, to="project_1")
+        assert received.wait(5)
+        assert payloads == [{"text": "hi"}]
+
+        # A room the client is not in gets nothing; the channel delivers in order, so once the
+        # next message arrives the other room's has been handled
+        received.clear()
+        first.emit("new_message", {"text": "other room"}, to="project_2")
+        second.emit("new_message", {"text": "same server"}, to="project_1")
+        assert received.wait(5)
+        assert payloads == [{"text": "hi"}, {"text": "same server"}]
+    finally:
+        client.disconnect()
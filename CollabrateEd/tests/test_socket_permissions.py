@@ -0,0 +1,102 @@
+import time
+
+import app as app_module
+from models import db, Message, Task
+
+
+def socket_for(app, login, user_id):
+    return app_module.socketio.test_client(app, flask_test_client=login(user_id))
+
+
+def wait_for_messages(app, count, timeout=2):
+    deadline = time.monotonic() + timeout
+    while True:
+        with app.app_context():
+            messages = Message.query.order_by(Message.id).all()
+        if len(messages) >= count or time.monotonic() > deadline:
+            return messages
+        time.sleep(0.01)
+
+
+def test_send_message_uses_session_user_not_payload(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    project_id = make_project(alice, [bob])
+    client = socket_for(app, login, bob)
+    assert client.emit("join_project", {"project_id": project_id}, callback=True)
+
+    assert client.emit("send_message", {"sender_id": alice, "project_id": project_id, "text": "hi"}, callback=True)
+
+    messages = wait_for_messages(app, 1)
+    assert [(m.sender_id, m.text) for m in messages] == [(bob, "hi")]
+
+
+def test_non_member_cannot_send_or_add_tasks(app, login, make_user, make_project):
+    alice, mallory = make_user("alice"), make_user("mallory")
+    project_id = make_project(alice)
+    listener = socket_for(app, login, alice)
+    assert listener.emit("join_project", {"project_id": project_id}, callback=True)
+    listener.get_received()
+
+    for client in (socket_for(app, login, mallory), socket_for(app, login, None)):
+        assert not client.emit("send_message", {"sender_id": alice, "project_id": project_id, "text": "x"},
+                               callback=True)
+        assert not client.emit("add_task", {"project_id": project_id, "title": "x", "assigned_to": alice},
+                               callback=True)
+        assert not client.emit("join_project", {"project_id": project_id}, callback=True)
+
+    app_module.message_writer.flush()
+    with app.app_context():
+        assert db.session.query(Message).count() == 0
+        assert db.session.query(Task).count() == 0
+    assert listener.get_received() == []
+
+
+def test_add_task_assignee_must_be_a_member(app, login, make_user, make_project):
+    alice, bob, carol = make_user("alice"), make_user("bob"), make_user("carol")
+    project_id = make_project(alice, [bob])
+    client = socket_for(app, login, alice)
+
+    assert client.emit("add_task", {"project_id": project_id, "title": "x", "assigned_to": carol},
+                       callback=True) == [False, "The assignee is not a member of this project"]
+    assert client.emit("add_task", {"project_id": project_id, "title": "y", "assigned_to": bob}, callback=True)
+    assert client.emit("add_task", {"project_id": project_id, "title": "z"}, callback=True)
+
+    with app.app_context():
+        assert sorted((t.title, t.assigned_to) for t in Task.query) == [("y", bob), ("z", alice)]
+
+
+def test_send_message_needs_the_joined_room_not_a_query(app, login, make_user, make_project, capture_sql):
+    alice = make_user("alice")
+    project_id, other = make_project(alice), make_project(alice)
+    client = socket_for(app, login, alice)
+    assert client.emit("join_project", {"project_id": project_id}, callback=True)
+
+    assert not client.emit("send_message", {"project_id": other, "text": "not joined"}, callback=True)
+    with app.app_context():
+        app_module.identity_cache.get(alice)  # warm, as after the user's first page load
+    with capture_sql() as statements:
+        assert client.emit("send_message", {"project_id": project_id, "text": "hi"}, callback=True)
+    assert statements == []
+
+    assert [m.text for m in wait_for_messages(app, 1)] == ["hi"]
+
+
+def test_add_task_rejects_invalid_input(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    client = socket_for(app, login, alice)
+
+    for payload, error in [
+        ({}, "A title is required"),
+        ({"title": None}, "A title is required"),
+        ({"title": "   "}, "A title is required"),
+        ({"title": ["x"]}, "A title is required"),
+        ({"title": "x" * 201}, "Title is too long"),
+        ({"title": "x", "assigned_to": "1"}, "Invalid assignee"),
+        ({"title": "x", "assigned_to": None}, "Invalid assignee"),
+        ({"title": "x", "assigned_to": True}, "Invalid assignee"),
+    ]:
+        assert client.emit("add_task", {"project_id": project_id, **payload}, callback=True) == [False, error]
+
+    with app.app_context():
+        assert Task.query.count() == 0
@@ -0,0 +1,97 @@
+import app as app_module
+from models import db, Project, Task
+
+JSON = {"Accept": "application/json"}
+
+
+def add_task(client, project_id, title):
+    return client.post(f"/tasks/{project_id}", data={"title": title}, headers=JSON).get_json()
+
+
+def test_since_returns_only_later_changes(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    client = login(alice)
+    first = add_task(client, project_id, "first")
+    second = add_task(client, project_id, "second")
+
+    everything = client.get(f"/team-projects/{project_id}/tasks").get_json()
+    assert everything["version"] == second["version"]
+    assert [t["id"] for t in everything["tasks"]] == [first["id"], second["id"]]
+
+    since = client.get(f"/team-projects/{project_id}/tasks?since={first['version']}").get_json()
+    assert [t["id"] for t in since["tasks"]] == [second["id"]]
+    assert client.get(f"/team-projects/{project_id}/tasks?since={second['version']}").get_json()["tasks"] == []
+
+
+def test_unchanged_project_answers_304(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    client = login(alice)
+    add_task(client, project_id, "first")
+
+    response = client.get(f"/team-projects/{project_id}/tasks")
+    etag = response.headers["ETag"]
+    cached = client.get(f"/team-projects/{project_id}/tasks", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    add_task(client, project_id, "second")
+    fresh = client.get(f"/team-projects/{project_id}/tasks", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+
+
+def test_version_increases_once_per_commit(app, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    with app.test_request_context():
+        tasks = [Task(title=f"t{i}", project_id=project_id, assigned_to=alice) for i in range(3)]
+        db.session.add_all(tasks)
+        deltas = app_module.commit_task_changes(project_id, tasks)
+        assert {d["version"] for d in deltas} == {1}
+        assert db.session.get(Project, project_id).task_version == 1
+
+        tasks[0].submitted = True
+        delta, = app_module.commit_task_changes(project_id, [tasks[0]])
+        assert delta["version"] == 2
+        assert db.session.get(Project, project_id).task_version == 2
+
+
+def test_room_client_receives_task_changed(app, login, make_user, make_project):
+    alice, bob = make_user("alice"), make_user("bob")
+    project_id = make_project(alice, [bob])
+    listener = app_module.socketio.test_client(app, flask_test_client=login(bob))
+    assert listener.emit("join_project", {"project_id": project_id}, callback=True)
+    listener.get_received()
+
+    delta = add_task(login(alice), project_id, "essay")
+
+    events = [e for e in listener.get_received() if e["name"] == "task_changed"]
+    assert [e["args"][0] for e in events] == [
+        {"project_id": project_id, "version": delta["version"], "task": delta}
+    ]
+    assert delta["title"] == "essay"
+    assert delta["assignee_username"] == "alice"
+
+
+def test_task_routes_answer_json_or_redirect(app, login, make_user, make_project):
+    alice = make_user("alice")
+    project_id = make_project(alice)
+    client = login(alice)
+
+    created = client.post(f"/tasks/{project_id}", data={"title": "essay"}, headers=JSON)
+    assert created.status_code == 201
+    task = created.get_json()
+    assert (task["title"], task["submitted"]) == ("essay", False)
+    assert client.post(f"/tasks/{project_id}", data={"title": " "}, headers=JSON).status_code == 400
+
+    submitted = client.post(f"/submit-task/{task['id']}", headers=JSON)
+    assert submitted.status_code == 200
+    assert submitted.get_json()["submitted"] is True
+    assert submitted.get_json()["version"] > task["version"]
+
+    for response in (client.post(f"/tasks/{project_id}", data={"title": "report"}),
+                     client.post(f"/submit-task/{task['id']}")):
+        assert response.status_code == 302
+        assert response.headers["Location"].endswith(f"/team-projects/{project_id}#tasks")
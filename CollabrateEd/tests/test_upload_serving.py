@@ -0,0 +1,122 @@
+import io
+import os
+
+import pytest
+
+import app as app_module
+from storage import BlobStore
+
+DATA = b"0123456789"
+
+
+@pytest.fixture
+def upload_root(app, monkeypatch, tmp_path):
+    root = tmp_path / "uploads"
+    root.mkdir()
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(root))
+    # Blobs live under the upload folder, as in the default layout, so x-accel paths can be mapped
+    monkeypatch.setattr(app_module, "blob_store", BlobStore(str(root / "blobs")))
+    return root
+
+
+@pytest.fixture
+def blob_url(app, upload_root):
+    digest, _ = app_module.blob_store.save_stream(io.BytesIO(DATA))
+    return digest, f"/uploads/{digest}/notes.pdf"
+
+
+@pytest.fixture
+def offload(app, monkeypatch):
+    def set_mode(mode):
+        monkeypatch.setitem(app.config, "UPLOAD_OFFLOAD", mode)
+        monkeypatch.setitem(app.config, "USE_X_SENDFILE", bool(mode))
+    return set_mode
+
+
+def test_full_response_is_cacheable(app, blob_url):
+    digest, url = blob_url
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == app.config["UPLOAD_IMMUTABLE_MAX_AGE"]
+
+
+def test_range_request_gets_partial_content(app, blob_url):
+    _, url = blob_url
+    response = app.test_client().get(url, headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 2-5/10"
+    assert response.data == DATA[2:6]
+
+    suffix = app.test_client().get(url, headers={"Range": "bytes=-3"})
+    assert suffix.status_code == 206 and suffix.data == DATA[-3:]
+
+
+def test_unsatisfiable_range(app, blob_url):
+    _, url = blob_url
+    response = app.test_client().get(url, headers={"Range": "bytes=20-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == "bytes */10"
+
+
+def test_if_range_with_stale_etag_sends_whole_file(app, blob_url):
+    _, url = blob_url
+    response = app.test_client().get(url, headers={"Range": "bytes=2-5", "If-Range": '"stale"'})
+    assert response.status_code == 200 and response.data == DATA
+
+
+def test_matching_etag_gets_not_modified(app, blob_url):
+    digest, url = blob_url
+    response = app.test_client().get(url, headers={"If-None-Match": f'"{digest}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_legacy_upload_revalidates(app, upload_root):
+    (upload_root / "old.pdf").write_bytes(DATA)
+    client = app.test_client()
+    response = client.get("/uploads/old.pdf")
+    assert response.status_code == 200 and response.data == DATA
+    assert response.cache_control.no_cache
+    assert client.get("/uploads/old.pdf", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_unknown_or_malformed_digest_is_404(app, upload_root):
+    client = app.test_client()
+    assert client.get(f"/uploads/{'0' * 64}/x.pdf").status_code == 404
+    assert client.get("/uploads/not-a-digest/x.pdf").status_code == 404
+
+
+def test_x_sendfile_offload_sends_headers_only(app, blob_url, offload):
+    digest, url = blob_url
+    offload("x-sendfile")
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.data == b""
+    assert response.headers["X-Sendfile"] == app_module.blob_store.path(digest)
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert "Accept-Ranges" not in response.headers  # the proxy handles Range itself
+
+
+def test_x_accel_offload_maps_to_internal_location(app, blob_url, offload):
+    digest, url = blob_url
+    offload("x-accel")
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.data == b""
+    assert "X-Sendfile" not in response.headers
+    internal = os.path.join("blobs", digest[:2], digest[2:4], digest).replace(os.sep, "/")
+    assert response.headers["X-Accel-Redirect"] == app.config["UPLOAD_ACCEL_PREFIX"] + internal
+
+
+@pytest.mark.parametrize("mode", ["x-sendfile", "x-accel"])
+def test_offload_not_modified_has_no_redirect(app, blob_url, offload, mode):
+    digest, url = blob_url
+    offload(mode)
+    response = app.test_client().get(url, headers={"If-None-Match": f'"{digest}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert "X-Sendfile" not in response.headers and "X-Accel-Redirect" not in response.headers